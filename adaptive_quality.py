@@ -0,0 +1,102 @@
+import os, json, time, socket
+from collections import deque
+
+HISTORY_FILE = 'quality_history.json'
+
+# Urutan preset dari paling berat ke paling ringan
+QUALITY_LADDER = ["1080p60", "720p60", "480p", "480p30"]
+
+# Abaikan metrik beberapa detik pertama setelah (re)start, encoder masih pemanasan
+WARMUP_SECONDS = 20
+# Turun jika rata-rata speed di bawah SPEED_DOWN (atau frame drop > DROP_RATIO_DOWN) selama DOWN_WINDOW detik
+DOWN_WINDOW = 30
+SPEED_DOWN = 0.95
+DROP_RATIO_DOWN = 0.02
+# Naik hanya jika speed >= SPEED_UP tanpa frame drop selama UP_WINDOW detik
+UP_WINDOW = 300
+SPEED_UP = 1.3
+# Preset yang baru saja gagal tidak dicoba lagi selama UP_BLOCK detik (hysteresis)
+UP_BLOCK = 1800
+# Preset dianggap "settled" jika tidak berubah selama SETTLE_SECONDS detik
+SETTLE_SECONDS = 600
+
+class QualityController:
+    """Pantau speed & frame drop encoder lalu putuskan kapan preset diturunkan / dinaikkan."""
+
+    def __init__(self, quality, ladder=QUALITY_LADDER):
+        self.ladder = ladder
+        self.quality = quality if quality in ladder else ladder[1]
+        self.samples = deque()
+        self.blocked_until = {}
+        self.last_switch = time.time()
+        self.settled = False
+
+    def reset(self):
+        self.samples.clear()
+        self.last_switch = time.time()
+        self.settled = False
+
+    def switch(self, quality):
+        self.quality = quality
+        self.reset()
+
+    def _window(self, now, seconds):
+        window = [sample for sample in self.samples if now - sample[0] <= seconds]
+        if len(window) < 2 or window[-1][0] - window[0][0] < seconds * 0.8:
+            return None
+        return window
+
+    def observe(self, metrics, now=None):
+        """Tambah satu sampel metrik. Return preset baru jika harus pindah, selain itu None."""
+        now = now or time.time()
+        if now - self.last_switch < WARMUP_SECONDS or metrics.get("speed") is None:
+            return None
+
+        self.samples.append((now, metrics["speed"], metrics.get("frame") or 0, metrics.get("drop_frames") or 0))
+        while self.samples and now - self.samples[0][0] > UP_WINDOW:
+            self.samples.popleft()
+
+        index = self.ladder.index(self.quality)
+        window = self._window(now, DOWN_WINDOW)
+        if window and index < len(self.ladder) - 1:
+            avg_speed = sum(sample[1] for sample in window) / len(window)
+            frames = window[-1][2] - window[0][2]
+            drops = window[-1][3] - window[0][3]
+            drop_ratio = drops / frames if frames > 0 else 0
+            if avg_speed < SPEED_DOWN or drop_ratio > DROP_RATIO_DOWN:
+                self.blocked_until[self.quality] = now + UP_BLOCK
+                return self.ladder[index + 1]
+
+        window = self._window(now, UP_WINDOW)
+        if window and index > 0:
+            higher = self.ladder[index - 1]
+            min_speed = min(sample[1] for sample in window)
+            drops = window[-1][3] - window[0][3]
+            if min_speed >= SPEED_UP and drops == 0 and self.blocked_until.get(higher, 0) < now:
+                return higher
+
+        if not self.settled and now - self.last_switch >= SETTLE_SECONDS:
+            self.settled = True
+        return None
+
+def history_key(video_path):
+    return f"{socket.gethostname()}|{os.path.abspath(video_path)}"
+
+def load_history():
+    if not os.path.exists(HISTORY_FILE):
+        return {}
+    with open(HISTORY_FILE, 'r') as f:
+        return json.load(f)
+
+def get_settled_quality(video_path):
+    entry = load_history().get(history_key(video_path))
+    return entry["quality"] if entry else None
+
+def record_settled_quality(video_path, quality):
+    """Simpan preset terakhir yang stabil untuk host & video ini."""
+    history = load_history()
+    history[history_key(video_path)] = {"quality": quality, "updated": time.time()}
+    tmp_path = HISTORY_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(history, f, indent=2)
+    os.replace(tmp_path, HISTORY_FILE)
@@ -0,0 +1,205 @@
+import os, sys, json, time, socket, subprocess, tempfile, threading
+import psutil
+
+BENCH_FILE = 'benchmark.json'
+# Panjang klip uji (detik video) per preset & mode
+BENCH_SECONDS = 15
+# Batas jumlah encode paralel yang diverifikasi
+MAX_VERIFY_STREAMS = 8
+# Stream dianggap kuat real-time jika speed minimal segini (sisakan ruang untuk jaringan & bot)
+REALTIME_SPEED = 1.05
+POLL_INTERVAL = 0.2
+MODES = ("landscape", "portrait")
+
+_running = threading.Lock()
+
+def build_bench_command(ffmpeg_path, preset, final_resolution, seconds, video_path=None):
+    """Encode klip uji (sintetis atau file library) dengan parameter live ke null sink, tanpa -re."""
+    from livestream import build_encode_args
+    if video_path:
+        source = ["-stream_loop", "-1", "-t", str(seconds), "-i", video_path]
+        maps = []
+    else:
+        width, height = final_resolution.split("x")
+        source = [
+            "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={preset['fps']}:duration={seconds}",
+            "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+        ]
+        maps = ["-map", "0:v", "-map", "1:a"]
+    return [ffmpeg_path, "-hide_banner", "-nostats", "-loglevel", "error", "-y"] + source + maps + \
+        build_encode_args(preset, final_resolution) + ["-f", "null", "-"]
+
+def run_encodes(cmds, seconds):
+    """Jalankan beberapa encode sekaligus. Return metrik per proses: speed, fps, CPU & RSS puncak."""
+    processes = []
+    for cmd in cmds:
+        stderr = tempfile.TemporaryFile()
+        processes.append((subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=stderr), stderr))
+    started = time.time()
+    stats = [{"cpu_seconds": 0.0, "rss_peak": 0, "elapsed": None} for _ in processes]
+    handles = []
+    for process, _ in processes:
+        try:
+            handles.append(psutil.Process(process.pid))
+        except psutil.Error:
+            handles.append(None)
+
+    while any(stat["elapsed"] is None for stat in stats):
+        for (process, _), handle, stat in zip(processes, handles, stats):
+            if stat["elapsed"] is not None:
+                continue
+            if handle:
+                try:
+                    with handle.oneshot():
+                        cpu = handle.cpu_times()
+                        stat["cpu_seconds"] = cpu.user + cpu.system
+                        stat["rss_peak"] = max(stat["rss_peak"], handle.memory_info().rss)
+                except psutil.Error:
+                    pass
+            if process.poll() is not None:
+                stat["elapsed"] = time.time() - started
+        time.sleep(POLL_INTERVAL)
+
+    results = []
+    for (process, stderr), stat in zip(processes, stats):
+        stderr.seek(0)
+        if process.returncode != 0:
+            error = stderr.read().decode(errors="ignore").strip().splitlines()[-1:] or ["unknown error"]
+            raise RuntimeError(f"[ERROR] Encode benchmark gagal: {error[0]}")
+        stderr.close()
+        elapsed = max(stat["elapsed"], 0.001)
+        results.append({
+            "speed": seconds / elapsed,
+            "cpu_percent": stat["cpu_seconds"] / elapsed * 100,
+            # Core CPU per stream saat berjalan real-time (detik CPU per detik video)
+            "cpu_cores": stat["cpu_seconds"] / seconds,
+            "rss_peak": stat["rss_peak"],
+        })
+    return results
+
+def estimate_streams(cost, speed, cores):
+    from livestream import CPU_RESERVE
+    if speed < REALTIME_SPEED or cost <= 0:
+        return 0
+    return max(int((cores - CPU_RESERVE) // cost), 1)
+
+def run_benchmark(seconds=BENCH_SECONDS, video_path=None, on_result=None):
+    """Benchmark semua preset di host ini lalu simpan hasilnya ke BENCH_FILE.
+
+    on_result(pesan) dipanggil setiap satu pengukuran selesai (untuk progres di bot / CLI).
+    """
+    from livestream import YOUTUBE_PRESET, adjust_resolution_for_mode
+    import ffmpeg_caps
+
+    if not _running.acquire(blocking=False):
+        raise RuntimeError("Benchmark sedang berjalan.")
+    try:
+        caps = ffmpeg_caps.get_capabilities()
+
+        def report(message):
+            print(f"[INFO] Benchmark: {message}")
+            if on_result:
+                on_result(message)
+
+        results = {}
+        for quality, preset in YOUTUBE_PRESET.items():
+            entry = {}
+            for mode in MODES:
+                final_resolution = adjust_resolution_for_mode(preset["resolution"], mode)
+                cmd = build_bench_command(caps["ffmpeg"], preset, final_resolution, seconds, video_path)
+                result = run_encodes([cmd], seconds)[0]
+                result["fps"] = result["speed"] * float(preset["fps"])
+                entry[mode] = result
+                report(f"{quality} {mode}: {result['fps']:.0f} fps, speed {result['speed']:.2f}x, "
+                       f"CPU {result['cpu_percent']:.0f}%, RAM {result['rss_peak'] // (1024 * 1024)} MB")
+
+            cost = max(entry[mode]["cpu_cores"] for mode in MODES)
+            speed = min(entry[mode]["speed"] for mode in MODES)
+            streams = min(estimate_streams(cost, speed, caps["cpu_count"]), MAX_VERIFY_STREAMS)
+            # Perkiraan dari satu encode dicek dengan encode paralel sungguhan
+            final_resolution = preset["resolution"]
+            while streams > 1:
+                cmd = build_bench_command(caps["ffmpeg"], preset, final_resolution, seconds, video_path)
+                parallel = run_encodes([cmd] * streams, seconds)
+                if min(r["speed"] for r in parallel) >= REALTIME_SPEED:
+                    break
+                streams -= 1
+            entry["cpu_cost"] = cost
+            entry["max_streams"] = streams
+            results[quality] = entry
+            report(f"{quality}: maks {streams} stream real-time")
+
+        data = {
+            "host": socket.gethostname(),
+            "cpu_count": caps["cpu_count"],
+            "ffmpeg_version": caps["version"],
+            "source": video_path or "testsrc2 (sintetis)",
+            "seconds": seconds,
+            "created": time.time(),
+            "results": results,
+        }
+        tmp_path = BENCH_FILE + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, BENCH_FILE)
+        return data
+    finally:
+        _running.release()
+
+def is_running():
+    return _running.locked()
+
+def load_results():
+    """Hasil benchmark host ini (None jika belum pernah dijalankan / dari host lain)."""
+    if not os.path.exists(BENCH_FILE):
+        return None
+    with open(BENCH_FILE, 'r') as f:
+        data = json.load(f)
+    return data if data.get("host") == socket.gethostname() else None
+
+def preset_result(quality):
+    data = load_results()
+    return data["results"].get(quality) if data else None
+
+def preset_cost(quality):
+    """Core CPU terukur per stream real-time untuk preset ini, atau None jika belum di-benchmark."""
+    result = preset_result(quality)
+    return result["cpu_cost"] if result else None
+
+def preset_limit(quality):
+    """Jumlah stream paralel preset ini yang masih real-time di host ini, atau None."""
+    result = preset_result(quality)
+    return result["max_streams"] if result else None
+
+def preset_warning(quality, mode=None):
+    """Peringatan jika host tidak kuat menjalankan preset secara real-time (None jika aman / belum diukur)."""
+    result = preset_result(quality)
+    if not result or result["max_streams"] > 0:
+        return None
+    speed = min(result[m]["speed"] for m in ([mode] if mode in MODES else MODES))
+    return f"Hasil benchmark: server tidak kuat {quality} real-time (speed {speed:.2f}x)."
+
+def format_results(data):
+    lines = [
+        f"🏁 Benchmark {data['host']} ({data['cpu_count']} core, ffmpeg {data['ffmpeg_version']})",
+        f"Sumber: {data['source']}, {data['seconds']} detik, "
+        f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(data['created']))}",
+        "",
+    ]
+    for quality, result in data["results"].items():
+        landscape, portrait = result["landscape"], result["portrait"]
+        lines.append(
+            f"{quality}: {landscape['fps']:.0f}/{portrait['fps']:.0f} fps (L/P), "
+            f"speed {landscape['speed']:.2f}x, CPU {result['cpu_cost']:.1f} core, "
+            f"RAM {max(landscape['rss_peak'], portrait['rss_peak']) // (1024 * 1024)} MB "
+            f"→ maks {result['max_streams']} stream"
+        )
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    # Pemakaian: python benchmark.py [detik] [video]
+    data = run_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else BENCH_SECONDS,
+        sys.argv[2] if len(sys.argv) > 2 else None
+    )
+    print(format_results(data))
@@ -1,33 +1,70 @@
 import os
+import sys
 import json
 import asyncio
-import threading
-from livestream import is_streaming
+import livestream
+import transcode_cache
+import library
+import ffmpeg_caps
+import benchmark
+import cpu_alloc
+import runtime_state
+import config_store
+import ingest
+import notifications
+import scheduler
+from livestream import is_streaming, describe_encode_path, format_encode_path, format_metrics
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, MessageHandler,
     CallbackQueryHandler, ContextTypes, filters
 )
 from functools import wraps
-from livestream import start_streaming, stop_streaming, schedule_stop, set_notifier
+from livestream import (
+    stop_streaming, find_ffmpeg, load_sessions,
+    manager, StreamLimitError, DEFAULT_SESSION
+)
 
 def load_config():
     with open("config.json", "r") as f:
         return json.load(f)
 
-def load_streaming():
-    if not os.path.exists("streaming.json"):
-        return {}
-    with open("streaming.json", "r") as f:
-        return json.load(f)
+def load_streaming(session=DEFAULT_SESSION):
+    return config_store.store.get(session, {})
+
+def update_streaming(session, **changes):
+    """Ubah sebagian key config sesi (key lain tidak ditimpa handler lain). Return config terbaru."""
+    return config_store.store.update(session, changes)
+
+def edit_streaming(session, change):
+    """Read-modify-write config sesi di bawah lock store, mis. menambah item list."""
+    return config_store.store.modify(session, change)
+
+def toggle_streaming(session, key):
+    return edit_streaming(session, lambda cfg: cfg.update({key: not cfg.get(key, False)}))
+
+def current_session(context):
+    return context.user_data.get("session", DEFAULT_SESSION)
 
-def save_streaming(data):
-    with open("streaming.json", "w") as f:
-        json.dump(data, f, indent=2)
+RTMP_URLS = {
+    "youtube": "rtmp://a.rtmp.youtube.com/live2",
+    "facebook": "rtmps://live-api-s.facebook.com:443/rtmp/",
+}
 
 config = load_config()
 TELEGRAM_TOKEN = config["telegram_token"]
 ADMIN_IDS = config.get("admin_ids", [])
+manager.max_sessions = config.get("max_sessions")
+if not config.get("cpu_pinning", True):
+    manager.allocator = None
+# Jumlah baris log ffmpeg yang ditampilkan menu Log
+LOG_TAIL = 30
+# Batas tunggu ganti preset terjadwal sampai encoder berjalan dengan preset baru (detik)
+SWITCH_TIMEOUT = 90
+LOG_LEVEL_LABELS = {"info": "semua", "warning": "warning & error", "error": "error saja"}
+# Notifikasi live (batch & rate limit per chat) dan jadwal start/stop, dibuat di post_init
+notifier = None
+job_scheduler = None
 
 def admin_only(func):
     @wraps(func)
@@ -48,23 +85,262 @@ async def send_status(user_id, message, context):
     except Exception as e:
         print(f"[ERROR] Gagal kirim pesan ke Telegram: {e}")
 
+async def prepare_cache(user_id, s, context, video_path=None, container="mp4"):
+    quality = s.get("resolution", "720p60")
+    mode = s.get("mode", "landscape")
+    max_bytes = int(float(s.get("cache_max_gb", transcode_cache.DEFAULT_CACHE_MAX_GB)) * 1024 ** 3)
+    try:
+        cached = await ingest.run_job(
+            transcode_cache.prepare_video, video_path or s["video_path"], quality, mode, find_ffmpeg(),
+            max_bytes, container, manager.allocator
+        )
+        await send_status(user_id, f"✅ Cache siap ({quality}/{mode}): {os.path.basename(cached)}", context)
+    except Exception as e:
+        await send_status(user_id, f"🚫 Gagal menyiapkan cache: {e}", context)
+
+async def list_videos():
+    """Daftar video dari index library (tanpa scan folder & probe ulang)."""
+    return await asyncio.to_thread(library.list_entries)
+
+def video_label(entry):
+    return f"{entry['name']} ({library.describe(entry)})"
+
+async def index_video(user_id, path, context):
+    """Probe video baru & buat thumbnail di worker pool, lalu kirim info ke admin. Return entry library."""
+    entry = await ingest.run_job(library.update, path)
+    if not entry:
+        return None
+    if entry.get("error"):
+        await send_status(user_id, f"⚠️ {entry['name']} tidak bisa dibaca ffprobe: {entry['error']}", context)
+        return None
+    info = (
+        f"🎞 {entry['name']}: {library.describe(entry)} "
+        f"({entry.get('orientation', '-')}, {entry.get('video_codec')}/{entry.get('audio_codec') or 'tanpa audio'})"
+    )
+    try:
+        thumbnail = await ingest.run_job(ingest.make_thumbnail, path, entry["sha256"], None, manager.allocator)
+        with open(thumbnail, 'rb') as f:
+            await context.bot.send_photo(chat_id=user_id, photo=f, caption=info)
+    except Exception as e:
+        print(f"[WARN] Thumbnail {entry['name']} gagal: {e}")
+        await send_status(user_id, info, context)
+    return entry
+
+async def edit_status(message, text):
+    try:
+        await message.edit_text(text)
+    except Exception as e:
+        print(f"[WARN] Gagal update pesan progress: {e}")
+
+async def ingest_upload(user_id, file, context, message):
+    """Unduh upload di background (tidak memblok handler lain), lalu probe, thumbnail & pre-transcode."""
+    name = ingest.safe_name(file.file_name)
+    async def progress(size):
+        await edit_status(message, f"⬇️ Mengunduh {name}: {ingest.format_progress(size, file.file_size)}")
+    try:
+        telegram_file = await file.get_file()
+        result = await ingest.ingest(telegram_file, name, progress)
+    except Exception as e:
+        print(f"[ERROR] Upload {name} gagal: {e}")
+        await edit_status(message, f"🚫 Gagal mengunduh {name}: {e}")
+        return
+    saved_name = os.path.basename(result["path"])
+    if result["duplicate"]:
+        await edit_status(message, f"♻️ Video yang sama sudah ada: {saved_name}. Upload tidak disimpan ulang.")
+        return
+    await edit_status(
+        message,
+        f"✅ Video diunggah: {saved_name} ({ingest.format_progress(result['size'])})"
+        + (f"\n(nama {name} sudah dipakai video lain)" if saved_name != name else "")
+    )
+    entry = await index_video(user_id, result["path"], context)
+    if entry and config.get("prepare_uploads", False):
+        # Langsung siapkan cache sesuai preset sesi admin agar live nanti cukup stream copy
+        s = load_streaming(context.user_data.get("session", DEFAULT_SESSION))
+        await prepare_cache(user_id, s, context, result["path"])
+
+async def run_benchmark(user_id, context):
+    loop = asyncio.get_running_loop()
+    def progress(message):
+        asyncio.run_coroutine_threadsafe(send_status(user_id, f"🏁 {message}", context), loop)
+    try:
+        data = await asyncio.to_thread(benchmark.run_benchmark, on_result=progress)
+        await send_status(user_id, benchmark.format_results(data), context)
+    except Exception as e:
+        await send_status(user_id, f"🚫 Benchmark gagal: {e}", context)
+
+def session_cores(name):
+    allocation = manager.get(name).allocation if manager.get(name) else None
+    return f" (core {cpu_alloc.format_cores(allocation['cores'])})" if allocation else ""
+
+def resolution_label(quality):
+    limit = benchmark.preset_limit(quality)
+    if limit is None:
+        return quality
+    return f"⚠️ {quality} (tidak kuat)" if limit == 0 else f"{quality} (maks {limit} stream)"
+
+def format_problems(problems):
+    return "\n".join(f"- {name}: {', '.join(warnings)}" for name, warnings in problems)
+
+def playlist_text(s, session):
+    live = manager.get(session)
+    playing = live.playlist_item if live and live.active else None
+    lines = [
+        f"📃 Playlist sesi {session}",
+        f"Mode Playlist: {'AKTIF' if s.get('playlist_enabled') else 'NONAKTIF'} | "
+        f"Acak: {'AKTIF' if s.get('shuffle') else 'NONAKTIF'}",
+        "",
+    ]
+    for i, path in enumerate(s.get("playlist", []), 1):
+        marker = "▶️" if path == playing else f"{i}."
+        lines.append(f"{marker} {os.path.basename(path)}{'' if os.path.exists(path) else ' (❌ file hilang)'}")
+    if not s.get("playlist"):
+        lines.append("(kosong)")
+    if playing:
+        lines.append(f"\nBerikutnya: {os.path.basename(live.playlist_next) if live.playlist_next else '-'}")
+        lines.append("Perubahan berlaku setelah video yang sedang diputar selesai.")
+    return "\n".join(lines)
+
+def log_text(session, count=LOG_TAIL, level="info"):
+    live = manager.get(session)
+    log = live.log if live else manager.logs.get(session)
+    if not log or not log.lines:
+        return f"📜 Belum ada log ffmpeg untuk sesi {session}."
+    counts = ", ".join(f"{name} {value}" for name, value in log.counts.items())
+    return (
+        f"📜 Log ffmpeg sesi {session} ({LOG_LEVEL_LABELS.get(level, level)}, {count} baris terakhir)\n"
+        f"Total: {counts}\n\n"
+        f"{log.format(count, level) or '(tidak ada baris dengan level ini)'}"
+    )
+
+async def run_scheduled(job):
+    """Jalankan satu jadwal (dipanggil scheduler saat waktunya tiba)."""
+    name, action, value = job["session"], job["action"], job.get("value")
+    user_id = job.get("user_id") or (ADMIN_IDS[0] if ADMIN_IDS else None)
+    try:
+        if action == "start":
+            await manager.start(name, notifier.push, user_id)
+            result = "live dimulai"
+        elif action == "stop":
+            result = "live dihentikan" if manager.is_running(name) else "sesi sudah tidak live"
+            await manager.stop(name)
+        elif action == "preset":
+            update_streaming(name, resolution=value)
+            live = manager.get(name)
+            result = f"resolusi diganti ke {value}"
+            switch = None
+            if live and live.active and live.encode_path == "playlist":
+                # Cache item playlist dibuat per preset: live dijalankan ulang dengan preset baru
+                await manager.stop(name)
+                await manager.start(name, notifier.push, user_id)
+                result += ", live dijalankan ulang"
+            elif live and live.active:
+                # Encoder dijalankan ulang dengan preset baru, lanjut dari posisi terakhir
+                switch = live.switch_quality(value)
+                if switch is None:
+                    result = f"resolusi disimpan {value}, live tetap {live.quality}"
+            else:
+                result += " (berlaku saat live berikutnya)"
+            if switch is not None:
+                try:
+                    applied = await asyncio.wait_for(asyncio.shield(switch), timeout=SWITCH_TIMEOUT)
+                    if applied is None:
+                        result = f"resolusi disimpan {value}, tapi live berhenti sebelum preset diganti"
+                except asyncio.TimeoutError:
+                    result = f"resolusi disimpan {value}, encoder belum berjalan lagi (diganti saat start berikutnya)"
+        else:
+            update_streaming(name, playlist_enabled=value)
+            result = f"mode playlist {'ON' if value else 'OFF'}"
+            if manager.is_running(name):
+                # Jenis input encoder berubah: live dijalankan ulang
+                await manager.stop(name)
+                await manager.start(name, notifier.push, user_id)
+                result += ", live dijalankan ulang"
+        message = f"🕐 Jadwal {scheduler.describe(job)}: {result}."
+    except Exception as e:
+        print(f"[ERROR] [{name}] Jadwal {action} gagal: {e}")
+        message = f"🚫 Jadwal {scheduler.describe(job)} gagal: {e}"
+    if user_id:
+        notifier.push(user_id, f"[{name}] {message}")
+
+async def prewarm_scheduled(job):
+    """Persiapan Start terjadwal beberapa menit sebelumnya agar live langsung jalan tepat waktu."""
+    name = job["session"]
+    user_id = job.get("user_id") or (ADMIN_IDS[0] if ADMIN_IDS else None)
+    try:
+        encode_path = await asyncio.to_thread(livestream.prewarm, name)
+        message = f"⏳ Live terjadwal {scheduler.format_time(job['run_at'])} siap ({encode_path})."
+    except Exception as e:
+        message = f"⚠️ Live terjadwal {scheduler.format_time(job['run_at'])} bermasalah: {e}"
+    if user_id:
+        notifier.push(user_id, f"[{name}] {message}")
+
+def schedule_text():
+    jobs = job_scheduler.list()
+    if not jobs:
+        return "🕐 Belum ada jadwal."
+    return "🕐 Jadwal:\n" + "\n".join(
+        f"#{job['id']} {scheduler.format_time(job['run_at'])} - {scheduler.describe(job)}" for job in jobs
+    )
+
+def schedule_keyboard(session):
+    keyboard = [
+        [InlineKeyboardButton(f"▶️ Start {session}", callback_data='sched_start'),
+         InlineKeyboardButton(f"⏹ Stop {session}", callback_data='sched_stop')],
+        [InlineKeyboardButton("🎚 Ganti Resolusi", callback_data='sched_preset'),
+         InlineKeyboardButton("📃 Playlist ON", callback_data='sched_playlist_on'),
+         InlineKeyboardButton("📃 Playlist OFF", callback_data='sched_playlist_off')],
+    ]
+    keyboard += [
+        [InlineKeyboardButton(f"❌ Batal #{job['id']} {scheduler.describe(job)}", callback_data=f"sched_cancel_{job['id']}")]
+        for job in job_scheduler.list()
+    ]
+    keyboard.append([InlineKeyboardButton("⬅️ Menu Utama", callback_data='main_menu')])
+    return InlineKeyboardMarkup(keyboard)
+
+def log_keyboard():
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📜 Semua", callback_data='log_info'),
+         InlineKeyboardButton("⚠️ Warning", callback_data='log_warning'),
+         InlineKeyboardButton("🚫 Error", callback_data='log_error')],
+        [InlineKeyboardButton("⬅️ Menu Utama", callback_data='main_menu')],
+    ])
+
+def playlist_keyboard(s):
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("➕ Tambah Video", callback_data='pl_add'),
+         InlineKeyboardButton("➖ Hapus Video", callback_data='pl_remove')],
+        [InlineKeyboardButton(f"🔀 Acak: {'ON' if s.get('shuffle') else 'OFF'}", callback_data='pl_shuffle'),
+         InlineKeyboardButton(f"📃 Mode Playlist: {'ON' if s.get('playlist_enabled') else 'OFF'}", callback_data='pl_toggle')],
+        [InlineKeyboardButton("⬅️ Menu Utama", callback_data='pl_done')],
+    ])
+
 async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    session = current_session(context)
     keyboard = [
+        [InlineKeyboardButton(f"🗂 Pilih Sesi (aktif: {session})", callback_data='choose_session')],
         [InlineKeyboardButton("📤 Upload Video", callback_data='upload')],
         [InlineKeyboardButton("⚙️ Set RTMP", callback_data='set_rtmp')],
         [InlineKeyboardButton("🔑 Input Stream Key", callback_data='set_key')],
+        [InlineKeyboardButton("➕ Tambah Tujuan Live", callback_data='add_destination')],
+        [InlineKeyboardButton("➖ Hapus Tujuan Live", callback_data='remove_destination')],
         [InlineKeyboardButton("🎞 Pilih Video", callback_data='choose_video')],
+        [InlineKeyboardButton("📃 Playlist", callback_data='playlist')],
         [InlineKeyboardButton("🎚 Set Resolusi", callback_data='set_resolution')],
         [InlineKeyboardButton("📱 Mode Live (Portrait/Landscape)", callback_data='set_mode')],
         [InlineKeyboardButton("🔁 Auto Looping", callback_data='toggle_looping')],
+        [InlineKeyboardButton("🤖 Auto Kualitas", callback_data='toggle_auto_quality')],
+        [InlineKeyboardButton("🧰 Prepare Video (Cache)", callback_data='prepare_video')],
+        [InlineKeyboardButton("🏁 Benchmark Server", callback_data='benchmark')],
         [InlineKeyboardButton("▶️ Start Live", callback_data='start_live')],
         [InlineKeyboardButton("⏹ Stop Live", callback_data='stop_live')],
-        [InlineKeyboardButton("🕐 Jadwal Stop", callback_data='schedule_stop')],
+        [InlineKeyboardButton("🕐 Jadwal", callback_data='schedule')],
         [InlineKeyboardButton("🗑 Hapus Video", callback_data='delete_video')],
         [InlineKeyboardButton("📋 Show Configure", callback_data='show_config')],
-        [InlineKeyboardButton("📡 Cek Status Live", callback_data='check_status')]
+        [InlineKeyboardButton("📡 Cek Status Live", callback_data='check_status')],
+        [InlineKeyboardButton("📜 Log FFmpeg", callback_data='log_info')]
     ]
-    message = "❗️BOT CREATOR : BENY - SHARE IT HUB"
+    message = f"❗️BOT CREATOR : BENY - SHARE IT HUB\n🗂 Sesi: {session}"
     if update.callback_query:
         await update.callback_query.message.reply_text(message, reply_markup=InlineKeyboardMarkup(keyboard))
     else:
@@ -74,15 +350,44 @@ async def show_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await show_main_menu(update, context)
 
+@admin_only
+async def show_log(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """/log [jumlah baris] [info|warning|error]"""
+    args = context.args or []
+    count = int(args[0]) if args and args[0].isdigit() else LOG_TAIL
+    level = args[1] if len(args) > 1 and args[1] in LOG_LEVEL_LABELS else "info"
+    await update.message.reply_text(log_text(current_session(context), count, level))
+
 @admin_only
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
     data = query.data
-    s = load_streaming()
+    session = current_session(context)
+    s = load_streaming(session)
     user_id = query.from_user.id
 
-    if data == "upload":
+    if data == "choose_session":
+        names = sorted(set(load_sessions()) | set(manager.sessions) | {DEFAULT_SESSION})
+        keyboard = [
+            [InlineKeyboardButton(
+                f"{'✅' if manager.is_running(name) else '⚪️'} {name}", callback_data=f"session_{name}"
+            )]
+            for name in names
+        ]
+        keyboard.append([InlineKeyboardButton("➕ Sesi Baru", callback_data='new_session')])
+        await query.edit_message_text("Pilih sesi live:", reply_markup=InlineKeyboardMarkup(keyboard))
+
+    elif data.startswith("session_"):
+        context.user_data["session"] = data.split("session_", 1)[1]
+        await query.edit_message_text(f"✅ Sesi aktif: {context.user_data['session']}")
+        await show_main_menu(update, context)
+
+    elif data == "new_session":
+        context.user_data["awaiting_session_name"] = True
+        await query.edit_message_text("Kirim nama sesi baru (huruf/angka, tanpa spasi):")
+
+    elif data == "upload":
         await query.edit_message_text("Silakan kirim file video ke bot.")
 
     elif data == "set_rtmp":
@@ -93,50 +398,146 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Pilih platform RTMP:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     elif data == "rtmp_youtube":
-        s["rtmp_url"] = "rtmp://a.rtmp.youtube.com/live2"
-        save_streaming(s)
+        update_streaming(session, rtmp_url=RTMP_URLS["youtube"])
         await query.edit_message_text("✅ RTMP diatur ke YouTube.")
         await show_main_menu(update, context)
 
     elif data == "rtmp_facebook":
-        s["rtmp_url"] = "rtmps://live-api-s.facebook.com:443/rtmp/"
-        save_streaming(s)
+        update_streaming(session, rtmp_url=RTMP_URLS["facebook"])
         await query.edit_message_text("✅ RTMP diatur ke Facebook.")
         await show_main_menu(update, context)
 
+    elif data == "add_destination":
+        keyboard = [
+            [InlineKeyboardButton("YouTube", callback_data='dest_youtube')],
+            [InlineKeyboardButton("Facebook", callback_data='dest_facebook')]
+        ]
+        await query.edit_message_text("Pilih platform tujuan tambahan:", reply_markup=InlineKeyboardMarkup(keyboard))
+
+    elif data in ("dest_youtube", "dest_facebook"):
+        context.user_data["awaiting_dest_url"] = RTMP_URLS[data.split("dest_")[1]]
+        await query.edit_message_text("Kirim stream key untuk tujuan tambahan:")
+
+    elif data == "remove_destination":
+        extras = s.get("extra_destinations", [])
+        if extras:
+            keyboard = [
+                [InlineKeyboardButton(f"🗑 {d.get('name', d['rtmp_url'])}", callback_data=f"rmdest_{i}")]
+                for i, d in enumerate(extras)
+            ]
+            await query.edit_message_text("Pilih tujuan yang ingin dihapus:", reply_markup=InlineKeyboardMarkup(keyboard))
+        else:
+            await query.edit_message_text("❌ Tidak ada tujuan tambahan.")
+            await show_main_menu(update, context)
+
+    elif data.startswith("rmdest_"):
+        index = int(data.split("rmdest_")[1])
+        removed = []
+        def remove_destination(cfg):
+            extras = cfg.get("extra_destinations", [])
+            if index < len(extras):
+                removed.append(extras.pop(index))
+        edit_streaming(session, remove_destination)
+        if removed:
+            await query.edit_message_text(f"🗑 Tujuan {removed[0].get('name', removed[0]['rtmp_url'])} dihapus.")
+        else:
+            await query.edit_message_text("❌ Tujuan tidak ditemukan.")
+        await show_main_menu(update, context)
+
     elif data == "set_key":
         context.user_data["awaiting_key"] = True
         await query.edit_message_text("Kirim stream key Anda:")
 
     elif data == "choose_video":
-        files = [f for f in os.listdir("videos") if f.endswith((".mp4", ".mkv", ".mov"))]
-        if files:
-            keyboard = [[InlineKeyboardButton(f, callback_data=f"video_{f}")] for f in files]
+        entries = await list_videos()
+        if entries:
+            keyboard = [[InlineKeyboardButton(video_label(e), callback_data=f"video_{e['name']}")] for e in entries]
             await query.edit_message_text("Pilih video:", reply_markup=InlineKeyboardMarkup(keyboard))
         else:
             await query.edit_message_text("❌ Tidak ada video di folder /videos.")
             await show_main_menu(update, context)
 
     elif data.startswith("video_"):
-        filename = data.split("video_")[1]
-        s["video_path"] = os.path.join("videos", filename)
-        save_streaming(s)
-        await query.edit_message_text(f"✅ Video dipilih: {filename}")
+        filename = data.split("video_", 1)[1]
+        if not filename or not os.path.isfile(os.path.join("videos", filename)):
+            await query.edit_message_text(f"❌ File {filename} tidak ditemukan.")
+            await show_main_menu(update, context)
+            return
+        s = update_streaming(session, video_path=os.path.join("videos", filename))
+        problems = await asyncio.to_thread(library.check_config, {**s, "playlist_enabled": False})
+        await query.edit_message_text(
+            f"✅ Video dipilih: {filename}"
+            + (f"\n\n⚠️ Tidak sesuai preset {s.get('resolution', '720p60')}/{s.get('mode', 'landscape')}:\n"
+               + format_problems(problems) if problems else "")
+        )
+        await show_main_menu(update, context)
+
+    elif data == "playlist":
+        await query.edit_message_text(playlist_text(s, session), reply_markup=playlist_keyboard(s))
+
+    elif data == "pl_add":
+        entries = await list_videos()
+        if entries:
+            keyboard = [[InlineKeyboardButton(f"➕ {video_label(e)}", callback_data=f"pladd_{e['name']}")] for e in entries]
+            await query.edit_message_text("Pilih video untuk ditambahkan ke playlist:", reply_markup=InlineKeyboardMarkup(keyboard))
+        else:
+            await query.edit_message_text("❌ Tidak ada video di folder /videos.")
+            await show_main_menu(update, context)
+
+    elif data.startswith("pladd_"):
+        path = os.path.join("videos", data.split("pladd_", 1)[1])
+        s = edit_streaming(session, lambda cfg: cfg.setdefault("playlist", []).append(path))
+        # Normalisasi ke MPEG-TS di background agar pergantian item tidak perlu encode ulang
+        asyncio.create_task(prepare_cache(user_id, dict(s), context, path, "mpegts"))
+        await query.edit_message_text(playlist_text(s, session), reply_markup=playlist_keyboard(s))
+
+    elif data == "pl_remove":
+        items = s.get("playlist", [])
+        if items:
+            keyboard = [
+                [InlineKeyboardButton(f"🗑 {i + 1}. {os.path.basename(p)}", callback_data=f"plrm_{i}")]
+                for i, p in enumerate(items)
+            ]
+            await query.edit_message_text("Pilih video yang dihapus dari playlist:", reply_markup=InlineKeyboardMarkup(keyboard))
+        else:
+            await query.edit_message_text(playlist_text(s, session), reply_markup=playlist_keyboard(s))
+
+    elif data.startswith("plrm_"):
+        index = int(data.split("plrm_", 1)[1])
+        def remove_item(cfg):
+            items = cfg.get("playlist", [])
+            if index < len(items):
+                items.pop(index)
+        s = edit_streaming(session, remove_item)
+        await query.edit_message_text(playlist_text(s, session), reply_markup=playlist_keyboard(s))
+
+    elif data == "pl_shuffle":
+        s = toggle_streaming(session, "shuffle")
+        await query.edit_message_text(playlist_text(s, session), reply_markup=playlist_keyboard(s))
+
+    elif data == "pl_toggle":
+        s = toggle_streaming(session, "playlist_enabled")
+        await query.edit_message_text(playlist_text(s, session), reply_markup=playlist_keyboard(s))
+
+    elif data.startswith("log_"):
+        level = data.split("log_", 1)[1]
+        await query.edit_message_text(log_text(session, LOG_TAIL, level), reply_markup=log_keyboard())
+
+    elif data in ("pl_done", "main_menu"):
         await show_main_menu(update, context)
 
     elif data == "set_resolution":
         keyboard = [
-            [InlineKeyboardButton("1080p60", callback_data='res_1080p60')],
-            [InlineKeyboardButton("720p60", callback_data='res_720p60')],
-            [InlineKeyboardButton("480p", callback_data='res_480p')],
+            [InlineKeyboardButton(resolution_label(quality), callback_data=f'res_{quality}')]
+            for quality in livestream.YOUTUBE_PRESET
         ]
         await query.edit_message_text("Pilih resolusi:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     elif data.startswith("res_"):
         res = data.split("res_")[1]
-        s["resolution"] = res
-        save_streaming(s)
-        await query.edit_message_text(f"✅ Resolusi diatur: {res}")
+        s = update_streaming(session, resolution=res)
+        warning = benchmark.preset_warning(res, s.get("mode"))
+        await query.edit_message_text(f"✅ Resolusi diatur: {res}" + (f"\n⚠️ {warning}" if warning else ""))
         await show_main_menu(update, context)
 
     elif data == "set_mode":
@@ -147,28 +548,70 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.edit_message_text("Pilih mode live streaming:", reply_markup=InlineKeyboardMarkup(keyboard))
 
     elif data == "mode_portrait":
-        s["mode"] = "portrait"
-        save_streaming(s)
+        update_streaming(session, mode="portrait")
         await query.edit_message_text("✅ Mode diatur ke *Portrait* (Vertikal)")
         await show_main_menu(update, context)
 
     elif data == "mode_landscape":
-        s["mode"] = "landscape"
-        save_streaming(s)
+        update_streaming(session, mode="landscape")
         await query.edit_message_text("✅ Mode diatur ke *Landscape* (Horizontal)")
         await show_main_menu(update, context)
 
     elif data == "toggle_looping":
-        looping = s.get("looping", False)
-        s["looping"] = not looping
-        save_streaming(s)
+        s = toggle_streaming(session, "looping")
         status = "✅ Auto Looping *AKTIF*" if s["looping"] else "❌ Auto Looping *NONAKTIF*"
         await query.edit_message_text(status, parse_mode="Markdown")
         await show_main_menu(update, context)
 
-    elif data == "start_live":
-        missing = []
+    elif data == "prepare_video":
         if not s.get("video_path") or not os.path.exists(s["video_path"]):
+            await query.edit_message_text("❌ Pilih video terlebih dahulu.")
+            await show_main_menu(update, context)
+        else:
+            await query.edit_message_text(
+                f"🧰 Menyiapkan cache {s.get('resolution', '720p60')}/{s.get('mode', 'landscape')} "
+                f"untuk {os.path.basename(s['video_path'])}...\nNotifikasi akan dikirim setelah selesai."
+            )
+            asyncio.create_task(prepare_cache(user_id, dict(s), context))
+
+    elif data == "benchmark":
+        results = benchmark.load_results()
+        keyboard = [
+            [InlineKeyboardButton("▶️ Jalankan Benchmark", callback_data='run_benchmark')],
+            [InlineKeyboardButton("⬅️ Menu Utama", callback_data='main_menu')],
+        ]
+        await query.edit_message_text(
+            (benchmark.format_results(results) if results else "Belum ada hasil benchmark untuk server ini.")
+            + f"\n\nBenchmark meng-encode klip uji {benchmark.BENCH_SECONDS} detik untuk setiap resolusi "
+            "(portrait & landscape) lalu menghitung berapa stream yang kuat berjalan bersamaan.",
+            reply_markup=InlineKeyboardMarkup(keyboard)
+        )
+
+    elif data == "run_benchmark":
+        if manager.running_sessions():
+            await query.edit_message_text("🚫 Hentikan semua live dulu, benchmark butuh CPU penuh.")
+            await show_main_menu(update, context)
+        elif benchmark.is_running():
+            await query.edit_message_text("⏳ Benchmark sedang berjalan.")
+        else:
+            await query.edit_message_text("🏁 Benchmark dimulai, hasil tiap resolusi akan dikirim...")
+            asyncio.create_task(run_benchmark(user_id, context))
+
+    elif data == "toggle_auto_quality":
+        s = toggle_streaming(session, "auto_quality")
+        status = (
+            "✅ Auto Kualitas *AKTIF*\nPreset akan turun/naik otomatis sesuai kemampuan server."
+            if s["auto_quality"] else "❌ Auto Kualitas *NONAKTIF*"
+        )
+        await query.edit_message_text(status, parse_mode="Markdown")
+        await show_main_menu(update, context)
+
+    elif data in ("start_live", "start_live_force"):
+        missing = []
+        if s.get("playlist_enabled"):
+            if not livestream.get_playlist(s):
+                missing.append("📃 Playlist (kosong)")
+        elif not s.get("video_path") or not os.path.exists(s["video_path"]):
             missing.append("🎞 Video")
         if not s.get("rtmp_url"):
             missing.append("📡 RTMP")
@@ -179,38 +622,80 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not s.get("mode"):
             missing.append("📱 Mode Live")
 
+        problems = [] if missing or data == "start_live_force" else await asyncio.to_thread(library.check_config, s)
         if missing:
             await query.edit_message_text(f"❌ Konfigurasi berikut belum lengkap:\n\n" + "\n".join(missing))
+        elif problems:
+            keyboard = [
+                [InlineKeyboardButton("▶️ Tetap Start", callback_data='start_live_force')],
+                [InlineKeyboardButton("⬅️ Batal", callback_data='main_menu')],
+            ]
+            await query.edit_message_text(
+                f"⚠️ Video tidak sesuai preset {s.get('resolution')}/{s.get('mode')}:\n\n"
+                f"{format_problems(problems)}\n\nTetap mulai live?",
+                reply_markup=InlineKeyboardMarkup(keyboard)
+            )
         else:
-            await query.edit_message_text("▶️ Memulai streaming...")
-            set_notifier(lambda uid, msg: send_status(uid, msg, context), user_id)
-
-            # Jalankan streaming di thread non-blocking
-            threading.Thread(target=lambda: asyncio.run(start_streaming()), daemon=True).start()
+            try:
+                # Supervisor berjalan sebagai task di event loop bot (cek sisa CPU host dulu)
+                await manager.start(session, notifier.push, user_id)
+                await query.edit_message_text(f"▶️ Memulai streaming sesi {session}...")
+            except (StreamLimitError, ffmpeg_caps.CapabilityError) as e:
+                await query.edit_message_text(f"🚫 Live tidak dimulai: {e}")
+                await show_main_menu(update, context)
 
     elif data == "stop_live":
         await query.edit_message_text("⏹ Menghentikan streaming...")
-        await stop_streaming()
+        await stop_streaming(session)
         await show_main_menu(update, context)
 
-    elif data == "schedule_stop":
-        context.user_data["awaiting_schedule"] = True
-        await query.edit_message_text("Kirim waktu (menit) untuk menghentikan streaming:")
+    elif data == "schedule":
+        await query.edit_message_text(schedule_text(), reply_markup=schedule_keyboard(session))
+
+    elif data == "sched_preset":
+        keyboard = [
+            [InlineKeyboardButton(resolution_label(quality), callback_data=f'sched_res_{quality}')]
+            for quality in livestream.YOUTUBE_PRESET
+        ]
+        await query.edit_message_text("Pilih resolusi untuk jadwal:", reply_markup=InlineKeyboardMarkup(keyboard))
+
+    elif data.startswith("sched_cancel_"):
+        job = job_scheduler.cancel(data.split("sched_cancel_", 1)[1])
+        text = f"✅ Jadwal dibatalkan: {scheduler.describe(job)}" if job else "❌ Jadwal sudah dijalankan / tidak ada."
+        await query.edit_message_text(f"{text}\n\n{schedule_text()}", reply_markup=schedule_keyboard(session))
+
+    elif data.startswith("sched_"):
+        action = data.split("sched_", 1)[1]
+        if action.startswith("res_"):
+            action, value = "preset", action.split("res_", 1)[1]
+        elif action.startswith("playlist_"):
+            action, value = "playlist", action == "playlist_on"
+        else:
+            value = None
+        context.user_data["awaiting_schedule"] = {"action": action, "value": value}
+        await query.edit_message_text(
+            f"Kirim waktu untuk {scheduler.describe({'action': action, 'session': session, 'value': value})}:\n"
+            "- menit dari sekarang, mis. 30\n- atau jam, mis. 21:00"
+        )
 
     elif data == "delete_video":
-        files = [f for f in os.listdir("videos") if f.endswith((".mp4", ".mkv", ".mov"))]
-        if files:
-            keyboard = [[InlineKeyboardButton(f"🗑 {f}", callback_data=f"del_{f}")] for f in files]
+        entries = await list_videos()
+        if entries:
+            keyboard = [[InlineKeyboardButton(f"🗑 {video_label(e)}", callback_data=f"del_{e['name']}")] for e in entries]
             await query.edit_message_text("Pilih video yang ingin dihapus:", reply_markup=InlineKeyboardMarkup(keyboard))
         else:
             await query.edit_message_text("❌ Tidak ada video di folder /videos.")
             await show_main_menu(update, context)
 
     elif data.startswith("del_"):
-        filename = data.split("del_")[1]
+        filename = data.split("del_", 1)[1]
         filepath = os.path.join("videos", filename)
         if os.path.exists(filepath):
+            entry = (await asyncio.to_thread(library.load_library))["files"].get(library.library_key(filepath))
             os.remove(filepath)
+            await asyncio.to_thread(library.remove, filepath)
+            if entry and entry.get("sha256"):
+                ingest.remove_thumbnail(entry["sha256"])
             await query.edit_message_text(f"🗑 Video {filename} berhasil dihapus.")
         else:
             await query.edit_message_text(f"❌ File {filename} tidak ditemukan.")
@@ -219,28 +704,59 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     elif data == "show_config":
         config_text = (
             f"🎞 Video: {s.get('video_path', '❌ Belum dipilih')}\n"
+            + (f"ℹ️ Info Video: {library.describe(await asyncio.to_thread(library.update, s['video_path']))}\n"
+               if s.get("video_path") else "") +
             f"🔗 RTMP: {s.get('rtmp_url', '❌ Belum diatur')}\n"
             f"🔑 Stream Key: {s.get('stream_key', '❌ Belum diatur')}\n"
+            + "".join(
+                f"➕ Tujuan: {d.get('name')} - {d['rtmp_url']} ({d['stream_key']})\n"
+                for d in s.get("extra_destinations", [])
+            ) +
             f"📏 Resolusi: {s.get('resolution', '❌ Belum diatur')}\n"
             f"📱 Mode: {s.get('mode', '❌ Belum diatur')}\n"
-            f"🔁 Auto Looping: {'AKTIF' if s.get('looping', False) else 'NONAKTIF'}"
+            f"🔁 Auto Looping: {'AKTIF' if s.get('looping', False) else 'NONAKTIF'}\n"
+            f"🤖 Auto Kualitas: {'AKTIF' if s.get('auto_quality', False) else 'NONAKTIF'}\n"
+            f"⚙️ Jalur Encode: {await asyncio.to_thread(describe_encode_path, s)}"
         )
         await query.edit_message_text(f"📋 Konfigurasi Saat Ini:\n{config_text}")
         await show_main_menu(update, context)
 
     elif data == "check_status":
-        if os.path.exists("streaming.json"):
-            s = load_streaming()
-            live_status = "✅ ONLINE" if is_streaming() else "🔴 OFFLINE"
+        if load_sessions():
+            live_status = "✅ ONLINE" if is_streaming(session) else "🔴 OFFLINE"
+            live = manager.get(session)
             status_text = (
-                f"Live Streaming Status\n"
+                f"Live Streaming Status ({session})\n"
                 f"{live_status}\n\n"
                 f"Platform: {s.get('rtmp_url', '-')}\n"
                 f"Video: {os.path.basename(s.get('video_path', '-')) if s.get('video_path') else '-'}\n"
-                f"Resolution: {s.get('resolution', '-')}\n"
+                f"Resolution: {s.get('resolution', '-')}"
+                f"{f' (sekarang {live.quality})' if live and live.active and live.quality != s.get('resolution') else ''}\n"
                 f"Mode: {s.get('mode', '-')}\n"
                 f"Looping: {'Aktif' if s.get('looping', False) else 'Nonaktif'}\n"
+                f"Encode: {format_encode_path(live.encode_path if live else None)}\n"
             )
+            if live and live.playlist_item:
+                status_text += (
+                    f"Playlist: {os.path.basename(live.playlist_item)} "
+                    f"(berikutnya: {os.path.basename(live.playlist_next) if live.playlist_next else '-'})\n"
+                )
+            if live and live.active:
+                status_text += "\n📊 Encoder:\n" + format_metrics(live)
+                status_text += "\n🧮 Alokasi CPU:\n" + livestream.format_allocation(live)
+            if live and live.destination_status:
+                status_text += "\nTujuan:\n" + "".join(
+                    f"- {name}: {st['state']} (retry {st['retries']}, buffer {st['buffered'] // 1024} KB)\n"
+                    for name, st in live.destination_status.items()
+                )
+            if manager.allocator and manager.allocator.reserved:
+                status_text += f"\nCore untuk bot: {cpu_alloc.format_cores(manager.allocator.reserved)}\n"
+            others = [name for name in manager.sessions if name != session]
+            if others:
+                status_text += "\nSesi lain:\n" + "".join(
+                    f"- {name}: {'ONLINE' if is_streaming(name) else 'OFFLINE'}{session_cores(name)}\n"
+                    for name in others
+                )
             await query.edit_message_text(status_text)
         else:
             await query.edit_message_text("❌ Belum ada konfigurasi streaming ditemukan.")
@@ -248,37 +764,106 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 @admin_only
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    s = load_streaming()
+    session = current_session(context)
+    s = load_streaming(session)
+
+    if context.user_data.get("awaiting_session_name"):
+        name = update.message.text.strip()
+        context.user_data["awaiting_session_name"] = False
+        if not name.replace("-", "").replace("_", "").isalnum():
+            await update.message.reply_text("❌ Nama sesi hanya boleh huruf, angka, - dan _.")
+        else:
+            if not config_store.store.exists(name):
+                update_streaming(name)
+            context.user_data["session"] = name
+            await update.message.reply_text(f"✅ Sesi aktif: {name}")
+        await show_main_menu(update, context)
 
-    if context.user_data.get("awaiting_key"):
-        s["stream_key"] = update.message.text.strip()
-        save_streaming(s)
+    elif context.user_data.get("awaiting_key"):
+        update_streaming(session, stream_key=update.message.text.strip())
         context.user_data["awaiting_key"] = False
         await update.message.reply_text("✅ Stream key disimpan.")
         await show_main_menu(update, context)
 
+    elif context.user_data.get("awaiting_dest_url"):
+        rtmp_url = context.user_data.pop("awaiting_dest_url")
+        stream_key = update.message.text.strip()
+        def add_destination(cfg):
+            extras = cfg.setdefault("extra_destinations", [])
+            extras.append({
+                "name": f"{livestream.destination_name(rtmp_url)} #{len(extras) + 2}",
+                "rtmp_url": rtmp_url, "stream_key": stream_key,
+            })
+        s = edit_streaming(session, add_destination)
+        await update.message.reply_text(f"✅ Tujuan tambahan disimpan: {s['extra_destinations'][-1]['name']}")
+        await show_main_menu(update, context)
+
     elif context.user_data.get("awaiting_schedule"):
+        pending = context.user_data.pop("awaiting_schedule")
         try:
-            minutes = int(update.message.text)
-            await update.message.reply_text(f"✅ Streaming akan dihentikan dalam {minutes} menit.")
-            asyncio.create_task(schedule_stop(minutes * 60))
+            run_at = scheduler.parse_time(update.message.text)
+            job = job_scheduler.add(session, pending["action"], run_at, update.effective_user.id, pending["value"])
+            await update.message.reply_text(
+                f"✅ Dijadwalkan #{job['id']} {scheduler.format_time(run_at)}: {scheduler.describe(job)}"
+            )
         except ValueError:
-            await update.message.reply_text("❌ Masukkan angka yang benar.")
-        context.user_data["awaiting_schedule"] = False
+            await update.message.reply_text("❌ Format waktu salah. Contoh: 30 (menit) atau 21:00")
         await show_main_menu(update, context)
 
     elif update.message.video or update.message.document:
         file = update.message.video or update.message.document
-        os.makedirs("videos", exist_ok=True)
-        file_path = f"videos/{file.file_name}"
-        telegram_file = await file.get_file()
-        await telegram_file.download_to_drive(file_path)
-        await update.message.reply_text(f"✅ Video diunggah: {file.file_name}")
+        message = await update.message.reply_text(f"⬇️ Mengunduh {ingest.safe_name(file.file_name)}...")
+        # Unduhan berjalan di background: beberapa upload bisa paralel & menu tetap responsif
+        asyncio.create_task(ingest_upload(update.effective_user.id, file, context, message))
         await show_main_menu(update, context)
 
+async def post_init(app):
+    global notifier, job_scheduler
+    notifier = notifications.Notifier(lambda uid, msg: send_status(uid, msg, app))
+    # ffmpeg sisa bot sebelumnya (crash / di-kill) dihentikan, sesi yang saat itu live dilanjutkan
+    interrupted = await asyncio.to_thread(runtime_state.reap_orphans)
+    if config.get("resume_after_restart", True):
+        for item in interrupted:
+            user_id = item["user_id"] or (ADMIN_IDS[0] if ADMIN_IDS else None)
+            try:
+                await manager.start(item["name"], notifier.push, user_id)
+                print(f"[INFO] [{item['name']}] Live dilanjutkan setelah bot restart.")
+            except Exception as e:
+                print(f"[ERROR] [{item['name']}] Gagal melanjutkan live: {e}")
+                if user_id:
+                    await send_status(user_id, f"🚫 [{item['name']}] Live tidak bisa dilanjutkan setelah bot restart: {e}", app)
+    # Jadwal yang tersimpan dilanjutkan; Start yang terlewat terlalu lama saat bot mati dibuang
+    job_scheduler = scheduler.Scheduler(run_scheduled, prewarm_scheduled)
+    for job in job_scheduler.load():
+        user_id = job.get("user_id") or (ADMIN_IDS[0] if ADMIN_IDS else None)
+        if user_id:
+            notifier.push(user_id, f"[{job['session']}] ⚠️ Jadwal {scheduler.describe(job)} "
+                                   f"{scheduler.format_time(job['run_at'])} terlewat saat bot mati, dibatalkan.")
+    # Samakan index library dengan folder videos (file yang dicopy manual ke server)
+    await asyncio.to_thread(ingest.cleanup_incoming)
+    asyncio.create_task(asyncio.to_thread(library.sync))
+
+async def shutdown(app):
+    job_scheduler.stop()
+    await manager.stop_all()
+    await notifier.flush_all()
+    # Perubahan config yang belum sempat ditulis (debounce) disimpan sebelum keluar
+    config_store.store.flush()
+
 def main():
-    app = ApplicationBuilder().token(TELEGRAM_TOKEN).build()
+    # Cek ffmpeg sekali saat startup: gagal di sini lebih jelas daripada saat Start Live
+    try:
+        caps = ffmpeg_caps.get_capabilities()
+    except ffmpeg_caps.CapabilityError as e:
+        print(str(e))
+        sys.exit(1)
+    print(f"[INFO] {ffmpeg_caps.describe(caps)}")
+    if "rtmps" not in caps["protocols"]:
+        print("[WARN] ffmpeg tanpa dukungan rtmps://, live ke Facebook tidak bisa dipakai.")
+
+    app = ApplicationBuilder().token(TELEGRAM_TOKEN).post_init(post_init).post_shutdown(shutdown).build()
     app.add_handler(CommandHandler("start", start))
+    app.add_handler(CommandHandler("log", show_log))
     app.add_handler(CallbackQueryHandler(button_handler))
     app.add_handler(MessageHandler(filters.ALL, message_handler))
     app.run_polling()
@@ -0,0 +1,157 @@
+import os, json, copy, atexit, threading
+
+CONFIG_FILE = 'streaming.json'
+DEFAULT_SESSION = 'default'
+# Perubahan beruntun (mis. beberapa tombol ditekan cepat) digabung jadi satu kali tulis
+SAVE_DELAY = 0.5
+
+class ConfigStore:
+    """Config semua sesi di memori (dengan lock), disimpan ke streaming.json secara atomic & debounced.
+
+    Setiap perubahan menaikkan nomor versi sesi, sehingga sesi live cukup membandingkan versi
+    untuk tahu ada perubahan tanpa membaca file lagi. File yang diedit manual saat bot berjalan
+    tetap terbaca (dicek dari mtime).
+    """
+
+    def __init__(self, path=CONFIG_FILE, save_delay=SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.version = 0
+        self._sessions = None
+        self._versions = {}
+        self._mtime = None
+        self._dirty = False
+        self._timer = None
+        self._lock = threading.RLock()
+        # Hanya satu penulis file sekaligus; pembaca config tidak ikut menunggu disk
+        self._write_lock = threading.Lock()
+
+    def _read_file(self):
+        """Baca streaming.json (format lama tanpa 'sessions' dianggap sesi 'default')."""
+        if not os.path.exists(self.path):
+            return {}, None
+        mtime = os.stat(self.path).st_mtime
+        with open(self.path, 'r') as f:
+            data = json.load(f)
+        if "sessions" not in data:
+            return ({DEFAULT_SESSION: data} if data else {}), mtime
+        return data["sessions"], mtime
+
+    def _ensure_loaded(self):
+        try:
+            mtime = os.stat(self.path).st_mtime if os.path.exists(self.path) else None
+        except OSError:
+            mtime = self._mtime
+        if self._sessions is not None and (self._dirty or mtime == self._mtime):
+            return
+        sessions, self._mtime = self._read_file()
+        if self._sessions is not None:
+            # File diubah dari luar bot: naikkan versi sesi yang berubah
+            for name in set(sessions) | set(self._sessions):
+                if sessions.get(name) != self._sessions.get(name):
+                    self._bump(name)
+        self._sessions = sessions
+
+    def _bump(self, name):
+        self.version += 1
+        self._versions[name] = self.version
+
+    def sessions(self):
+        with self._lock:
+            self._ensure_loaded()
+            return copy.deepcopy(self._sessions)
+
+    def exists(self, name):
+        with self._lock:
+            self._ensure_loaded()
+            return name in self._sessions
+
+    def get(self, name, default=None):
+        """Salinan config sesi (aman diubah tanpa mempengaruhi store)."""
+        with self._lock:
+            self._ensure_loaded()
+            if name not in self._sessions:
+                return default
+            return copy.deepcopy(self._sessions[name])
+
+    def version_of(self, name):
+        with self._lock:
+            self._ensure_loaded()
+            return self._versions.get(name, 0)
+
+    def modify(self, name, change):
+        """Ubah config sesi di bawah lock: change(config) mengubah dict langsung. Return salinan terbaru.
+
+        Dipakai untuk read-modify-write agar dua handler yang berjalan bersamaan tidak saling menimpa.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            config = self._sessions.setdefault(name, {})
+            change(config)
+            self._bump(name)
+            self._schedule_save()
+            return copy.deepcopy(config)
+
+    def update(self, name, changes):
+        """Ubah sebagian key config sesi (key lain tidak ditimpa)."""
+        return self.modify(name, lambda config: config.update(changes))
+
+    def set(self, name, config):
+        def replace(current):
+            current.clear()
+            current.update(copy.deepcopy(config))
+        return self.modify(name, replace)
+
+    def delete(self, name):
+        with self._lock:
+            self._ensure_loaded()
+            if self._sessions.pop(name, None) is not None:
+                self._bump(name)
+                self._schedule_save()
+
+    def _schedule_save(self):
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """Tulis ke disk sekarang: file sementara + fsync + rename, jadi file tidak pernah setengah tertulis.
+
+        Lock store hanya dipegang untuk menyalin config; tulis & fsync berjalan di luar lock agar
+        pembaca di event loop (mis. reload_config tiap update progress) tidak ikut menunggu disk.
+        """
+        with self._write_lock:
+            with self._lock:
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                data = {"sessions": copy.deepcopy(self._sessions)}
+                self._dirty = False
+            directory = os.path.dirname(os.path.abspath(self.path))
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(data, f, indent=2)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                with self._lock:
+                    # Gagal tulis: tandai kotor lagi agar dicoba pada flush berikutnya
+                    self._dirty = True
+                raise
+            if hasattr(os, "O_DIRECTORY"):
+                fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            with self._lock:
+                self._mtime = os.stat(self.path).st_mtime
+
+store = ConfigStore()
+atexit.register(store.flush)
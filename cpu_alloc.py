@@ -0,0 +1,133 @@
+import os, math, itertools, threading, subprocess
+import psutil
+
+# Prioritas proses (nice) ffmpeg: bot Telegram tetap 0 sehingga selalu didahulukan
+ENCODE_NICE = 5
+# Stream copy & pusher ringan tapi sensitif terhadap jeda, jadi sedikit lebih tinggi dari encoder
+COPY_NICE = 2
+# Pekerjaan latar (pre-transcode cache, thumbnail) selalu mengalah pada live & bot
+BACKGROUND_NICE = 15
+# Thread ffmpeg per pekerjaan latar (juga jumlah core yang dicatat di allocator)
+BACKGROUND_THREADS = 2
+# Core yang disisakan untuk bot & sistem hanya jika host punya lebih dari MIN_CORES_FOR_RESERVE core
+MIN_CORES_FOR_RESERVE = 3
+
+def available_cores():
+    """Core yang boleh dipakai proses ini (memperhitungkan affinity / cgroup cpuset)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    try:
+        return sorted(psutil.Process().cpu_affinity())
+    except (AttributeError, psutil.Error):
+        return list(range(psutil.cpu_count() or 1))
+
+def format_cores(cores):
+    """[0, 1, 2, 5] -> '0-2,5'"""
+    ranges = []
+    for core in sorted(cores):
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{a}-{b}" if a != b else str(a) for a, b in ranges)
+
+class CoreAllocator:
+    """Bagi core host ke sesi live: tiap sesi dapat set core, jumlah thread x264 dan nice sesuai bebannya.
+
+    Core paling depan disisakan untuk bot. Sesi diberi core yang paling sedikit terpakai; jika core
+    habis, sesi berbagi core dengan beban terendah.
+    """
+
+    def __init__(self, cores=None, reserve=1.0):
+        self.cores = cores or available_cores()
+        reserved = math.ceil(reserve) if len(self.cores) >= MIN_CORES_FOR_RESERVE else 0
+        self.reserved = self.cores[:reserved]
+        self.pool = self.cores[reserved:] or self.cores
+        self.load = {core: 0.0 for core in self.pool}
+        self.allocations = {}
+        self._lock = threading.Lock()
+
+    def allocate(self, name, cost, encode=True):
+        """Alokasikan core untuk sesi `name` dengan perkiraan beban `cost` core. Return dict alokasi."""
+        with self._lock:
+            self._release(name)
+            count = min(max(math.ceil(cost), 1), len(self.pool))
+            chosen = sorted(self.pool, key=lambda core: (self.load[core], core))[:count]
+            for core in chosen:
+                self.load[core] += cost / count
+            allocation = {
+                "cores": sorted(chosen),
+                # Thread x264 = jumlah core yang dialokasikan, agar tidak berebut dengan sesi lain
+                "threads": count if encode else None,
+                "nice": ENCODE_NICE if encode else COPY_NICE,
+                "cost": cost,
+            }
+            self.allocations[name] = allocation
+            return allocation
+
+    def allocate_background(self, name, threads=BACKGROUND_THREADS):
+        """Core untuk pekerjaan latar: bebannya dicatat seperti sesi (sesi live memilih core lain),
+        tapi thread dibatasi dan nice tinggi."""
+        allocation = self.allocate(name, threads)
+        allocation["nice"] = BACKGROUND_NICE
+        return allocation
+
+    def _release(self, name):
+        allocation = self.allocations.pop(name, None)
+        if allocation:
+            for core in allocation["cores"]:
+                self.load[core] = max(self.load[core] - allocation["cost"] / len(allocation["cores"]), 0.0)
+
+    def release(self, name):
+        with self._lock:
+            self._release(name)
+
+def apply(pid, allocation):
+    """Terapkan affinity & nice ke proses ffmpeg yang baru dijalankan (diabaikan jika OS tidak mendukung)."""
+    if not allocation:
+        return
+    try:
+        process = psutil.Process(pid)
+    except psutil.Error:
+        return
+    try:
+        if allocation["cores"]:
+            process.cpu_affinity(allocation["cores"])
+    except (AttributeError, ValueError, psutil.Error):
+        pass
+    try:
+        if psutil.WINDOWS:
+            process.nice(psutil.IDLE_PRIORITY_CLASS if allocation["nice"] >= BACKGROUND_NICE
+                         else psutil.BELOW_NORMAL_PRIORITY_CLASS)
+        else:
+            process.nice(allocation["nice"])
+    except (AttributeError, psutil.Error):
+        pass
+
+_job_ids = itertools.count(1)
+
+def run_background(build_command, name, allocator=None, timeout=None):
+    """Jalankan ffmpeg latar (pre-transcode, thumbnail) sampai selesai.
+
+    build_command(threads) membuat command. Proses dijalankan di core pool (bukan core cadangan bot)
+    dengan thread terbatas & nice tinggi, dan tercatat di allocator selama berjalan. Tanpa allocator
+    (pinning mati) hanya thread & nice yang dibatasi. Return CompletedProcess (stderr saja yang disimpan).
+    """
+    job_name = f"{name}#{next(_job_ids)}"
+    if allocator:
+        allocation = allocator.allocate_background(job_name)
+    else:
+        allocation = {"cores": None, "threads": BACKGROUND_THREADS, "nice": BACKGROUND_NICE, "cost": 0}
+    try:
+        process = subprocess.Popen(build_command(allocation["threads"]), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        apply(process.pid, allocation)
+        try:
+            _, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise
+        return subprocess.CompletedProcess(process.args, process.returncode, None, stderr)
+    finally:
+        if allocator:
+            allocator.release(job_name)
@@ -0,0 +1,185 @@
+import os, json, time, shutil, subprocess, threading
+import cpu_alloc
+
+# Hasil probe disimpan agar restart bot tidak perlu mencari & mengecek ffmpeg lagi
+CAPS_FILE = 'ffmpeg_caps.json'
+
+REQUIRED_ENCODERS = ("libx264", "aac")
+REQUIRED_MUXERS = ("tee", "flv", "mpegts")
+REQUIRED_PROTOCOLS = ("rtmp", "udp")
+# Folder yang tidak perlu ditelusuri saat mencari ffmpeg lokal (isinya bisa puluhan GB)
+SKIP_DIRS = {"videos", "cache", ".git", "__pycache__", "venv", ".venv", "node_modules"}
+
+_lock = threading.Lock()
+_caps = None
+
+class CapabilityError(Exception):
+    pass
+
+def locate_ffmpeg(root_dir=None):
+    ffmpeg_in_path = shutil.which("ffmpeg")
+    if ffmpeg_in_path:
+        print(f"[INFO] ffmpeg ditemukan di PATH sistem: {ffmpeg_in_path}")
+        return ffmpeg_in_path
+
+    root_dir = root_dir or os.path.dirname(os.path.abspath(__file__))
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        for filename in filenames:
+            if filename.lower() in ("ffmpeg", "ffmpeg.exe"):
+                full_path = os.path.join(dirpath, filename)
+                print(f"[INFO] ffmpeg ditemukan di lokal folder: {full_path}")
+                return full_path
+
+    raise CapabilityError(
+        "[ERROR] ffmpeg executable tidak ditemukan.\n"
+        "Pastikan ffmpeg tersedia di PATH atau folder lokal project."
+    )
+
+def locate_ffprobe(ffmpeg_path):
+    ffprobe_in_path = shutil.which("ffprobe")
+    if ffprobe_in_path:
+        return ffprobe_in_path
+
+    # Biasanya ffprobe berada di folder yang sama dengan ffmpeg
+    base_dir = os.path.dirname(ffmpeg_path)
+    for filename in ("ffprobe", "ffprobe.exe"):
+        candidate = os.path.join(base_dir, filename)
+        if os.path.exists(candidate):
+            return candidate
+
+    raise CapabilityError(
+        "[ERROR] ffprobe executable tidak ditemukan.\n"
+        "Pastikan ffprobe tersedia di PATH atau satu folder dengan ffmpeg."
+    )
+
+def run_listing(ffmpeg_path, flag):
+    result = subprocess.run([ffmpeg_path, "-hide_banner", flag], capture_output=True, timeout=30)
+    return result.stdout.decode(errors="ignore").splitlines()
+
+def parse_codec_list(lines):
+    """Nama encoder / muxer dari output 'ffmpeg -encoders' / '-muxers' (baris setelah garis '--')."""
+    names = set()
+    started = False
+    for line in lines:
+        if line.strip().startswith("--"):
+            started = True
+            continue
+        parts = line.split()
+        if started and len(parts) >= 2:
+            names.update(parts[1].split(","))
+    return names
+
+def parse_protocols(lines):
+    """Protokol output dari 'ffmpeg -protocols'."""
+    names = set()
+    output = False
+    for line in lines:
+        if line.strip().endswith(":"):
+            output = line.strip() == "Output:"
+            continue
+        if output and line.strip():
+            names.add(line.strip())
+    return names
+
+def usable_cores():
+    """Jumlah core yang boleh dipakai proses ini (memperhitungkan affinity / cgroup cpuset)."""
+    return len(cpu_alloc.available_cores())
+
+def binary_signature(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+def probe(ffmpeg_path):
+    """Jalankan ffmpeg sekali untuk mencatat versi, encoder, muxer dan protokol yang tersedia."""
+    version = run_listing(ffmpeg_path, "-version")
+    first_line = version[0].split() if version else []
+    return {
+        "ffmpeg": ffmpeg_path,
+        "ffprobe": locate_ffprobe(ffmpeg_path),
+        "binary": binary_signature(ffmpeg_path),
+        "version": first_line[2] if len(first_line) > 2 else "unknown",
+        "encoders": sorted(parse_codec_list(run_listing(ffmpeg_path, "-encoders")) & set(REQUIRED_ENCODERS)),
+        "muxers": sorted(parse_codec_list(run_listing(ffmpeg_path, "-muxers")) & set(REQUIRED_MUXERS)),
+        "protocols": sorted(parse_protocols(run_listing(ffmpeg_path, "-protocols"))),
+        "cpu_count": usable_cores(),
+        "checked": time.time(),
+    }
+
+def load_cached():
+    """Hasil probe tersimpan, hanya jika binary ffmpeg & ffprobe masih sama."""
+    if not os.path.exists(CAPS_FILE):
+        return None
+    try:
+        with open(CAPS_FILE, 'r') as f:
+            caps = json.load(f)
+        if binary_signature(caps["ffmpeg"]) != caps["binary"] or not os.path.exists(caps["ffprobe"]):
+            return None
+        # ffmpeg di PATH diganti versi lain: probe ulang
+        in_path = shutil.which("ffmpeg")
+        if in_path and os.path.abspath(in_path) != os.path.abspath(caps["ffmpeg"]):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+    caps["cpu_count"] = usable_cores()
+    return caps
+
+def save_cached(caps):
+    tmp_path = CAPS_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(caps, f, indent=2)
+    os.replace(tmp_path, CAPS_FILE)
+
+def missing_features(caps):
+    missing = [f"encoder {name}" for name in REQUIRED_ENCODERS if name not in caps["encoders"]]
+    missing += [f"muxer {name}" for name in REQUIRED_MUXERS if name not in caps["muxers"]]
+    missing += [f"protokol {name}" for name in REQUIRED_PROTOCOLS if name not in caps["protocols"]]
+    return missing
+
+def get_capabilities(refresh=False):
+    """Kemampuan ffmpeg host ini. Dicari & dicek sekali, lalu dipakai semua sesi.
+
+    Raise CapabilityError jika ffmpeg / ffprobe tidak ada atau fitur wajib tidak tersedia.
+    """
+    global _caps
+    with _lock:
+        if _caps and not refresh:
+            return _caps
+        caps = None if refresh else load_cached()
+        if caps is None:
+            caps = probe(locate_ffmpeg())
+            save_cached(caps)
+        missing = missing_features(caps)
+        if missing:
+            raise CapabilityError(
+                f"[ERROR] ffmpeg {caps['version']} ({caps['ffmpeg']}) tidak mendukung: {', '.join(missing)}.\n"
+                "Install build ffmpeg yang lengkap (mis. paket ffmpeg dari distro)."
+            )
+        _caps = caps
+        return caps
+
+def check_destinations(destinations, caps=None):
+    """Raise CapabilityError jika ada tujuan rtmps:// tapi ffmpeg dibuild tanpa TLS."""
+    caps = caps or get_capabilities()
+    for dest in destinations:
+        protocol = dest["url"].split("://", 1)[0].lower()
+        if protocol not in caps["protocols"]:
+            raise CapabilityError(
+                f"[ERROR] Tujuan {dest['name']} memakai {protocol}:// tapi ffmpeg {caps['version']} "
+                f"tidak mendukung protokol ini."
+            )
+
+def describe(caps):
+    return (
+        f"ffmpeg {caps['version']} ({caps['ffmpeg']}), {caps['cpu_count']} core, "
+        f"encoder: {', '.join(caps['encoders'])}, muxer: {', '.join(caps['muxers'])}, "
+        f"rtmps: {'ya' if 'rtmps' in caps['protocols'] else 'tidak'}"
+    )
+
+if __name__ == "__main__":
+    # Pemakaian: python ffmpeg_caps.py  (probe ulang & tampilkan kemampuan ffmpeg)
+    try:
+        print(f"[INFO] {describe(get_capabilities(refresh=True))}")
+    except CapabilityError as e:
+        print(str(e))
+        raise SystemExit(1)
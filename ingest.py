@@ -0,0 +1,175 @@
+import os, time, asyncio, hashlib, tempfile, threading, functools, urllib.parse
+import concurrent.futures
+import httpx
+import library
+import transcode_cache
+import ffmpeg_caps
+import cpu_alloc
+
+# Upload diunduh ke folder ini dulu (satu filesystem dengan videos/ agar bisa di-rename atomic)
+INCOMING_DIR = os.path.join(library.VIDEO_DIR, '.incoming')
+THUMBNAIL_DIR = 'thumbnails'
+CHUNK_SIZE = 1024 * 1024
+# Pekerjaan berat setelah upload (probe, thumbnail, pre-transcode) yang boleh berjalan bersamaan
+MAX_JOBS = 2
+# Jarak minimum antar update progress ke Telegram (detik), agar tidak kena rate limit
+PROGRESS_INTERVAL = 3
+
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_JOBS, thread_name_prefix="ingest")
+_move_lock = threading.Lock()
+# Hash upload yang sudah dipindah ke videos/ tapi mungkin belum masuk index library
+_committed = {}
+
+def safe_name(file_name):
+    """Nama file upload tanpa path (mencegah ../) dengan ekstensi video yang didukung."""
+    name = os.path.basename((file_name or "").replace("\\", "/")).strip()
+    if not name or name.startswith("."):
+        # Jangan diawali prefix callback tombol (video_, del_, pladd_, ...)
+        name = f"upload_{int(time.time())}.mp4"
+    if not name.lower().endswith(library.SUPPORTED_EXT):
+        name += ".mp4"
+    return name
+
+def format_progress(size, total=None):
+    mb = size / 1024 ** 2
+    if total:
+        return f"{size * 100 // total}% ({mb:.1f}/{total / 1024 ** 2:.1f} MB)"
+    return f"{mb:.1f} MB"
+
+def encoded_url(url):
+    parts = urllib.parse.urlsplit(url)
+    return urllib.parse.urlunsplit(parts._replace(path=urllib.parse.quote(parts.path)))
+
+async def iter_chunks(telegram_file):
+    """Isi file Telegram per potongan, tanpa menampung seluruh video di RAM."""
+    path = telegram_file.file_path
+    if path and os.path.isfile(path):
+        # Bot API server lokal (--local): file sudah ada di disk
+        with open(path, 'rb') as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+    async with httpx.AsyncClient(timeout=httpx.Timeout(30, read=120)) as client:
+        async with client.stream("GET", encoded_url(path)) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                yield chunk
+
+def write_chunk(f, sha, chunk):
+    sha.update(chunk)
+    f.write(chunk)
+
+async def download(telegram_file, on_progress=None):
+    """Unduh ke file sementara sambil di-hash. Return (path sementara, sha256, ukuran)."""
+    os.makedirs(INCOMING_DIR, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix=".part", dir=INCOMING_DIR)
+    sha = hashlib.sha256()
+    size = 0
+    last_progress = time.time()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            async for chunk in iter_chunks(telegram_file):
+                await asyncio.to_thread(write_chunk, f, sha, chunk)
+                size += len(chunk)
+                if on_progress and time.time() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.time()
+                    await on_progress(size)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return tmp_path, sha.hexdigest(), size
+
+def unique_path(file_name, base_dir=library.VIDEO_DIR):
+    """videos/<nama>, atau 'nama (2).mp4' dst. jika sudah ada file lain dengan nama itu."""
+    stem, ext = os.path.splitext(file_name)
+    path = os.path.join(base_dir, file_name)
+    counter = 2
+    while os.path.exists(path):
+        path = os.path.join(base_dir, f"{stem} ({counter}){ext}")
+        counter += 1
+    return path
+
+def find_duplicate(digest):
+    path = _committed.get(digest)
+    if path and os.path.exists(path):
+        return path
+    entry = library.find_by_hash(digest)
+    return entry["path"] if entry else None
+
+def commit(tmp_path, file_name, digest):
+    """Pindahkan file sementara ke library (rename atomic, tidak pernah menimpa video lain).
+
+    Return (path, duplicate). Jika isi yang sama sudah ada, file sementara dibuang.
+    """
+    with _move_lock:
+        # Dicek di bawah lock agar dua upload paralel dengan isi sama tidak tersimpan dua kali
+        existing = find_duplicate(digest)
+        if existing:
+            os.remove(tmp_path)
+            return existing, True
+        path = unique_path(file_name)
+        os.replace(tmp_path, path)
+        _committed[digest] = path
+    transcode_cache.remember_hash(path, digest)
+    return path, False
+
+async def ingest(telegram_file, file_name, on_progress=None):
+    """Unduh upload, buang jika isinya sudah ada di library, lalu simpan ke videos/.
+
+    Return dict: path, sha256, size, duplicate (True jika memakai video yang sudah ada).
+    """
+    tmp_path, digest, size = await download(telegram_file, on_progress)
+    path, duplicate = await asyncio.to_thread(commit, tmp_path, file_name, digest)
+    if not duplicate:
+        print(f"[INFO] Upload disimpan: {path} ({format_progress(size)})")
+    return {"path": path, "sha256": digest, "size": size, "duplicate": duplicate}
+
+def thumbnail_path(digest):
+    return os.path.join(THUMBNAIL_DIR, f"{digest[:32]}.jpg")
+
+def make_thumbnail(path, digest, ffmpeg_path=None, allocator=None):
+    """Gambar kecil (lebar 320px) dari detik ke-1 video, disimpan per hash isi file. Return path.
+
+    `allocator` (CoreAllocator) membatasi ffmpeg ke core pool; None = tanpa pinning.
+    """
+    output = thumbnail_path(digest)
+    if os.path.exists(output):
+        return output
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    ffmpeg_path = ffmpeg_path or ffmpeg_caps.get_capabilities()["ffmpeg"]
+    tmp_path = output + ".tmp"
+    result = cpu_alloc.run_background(
+        lambda threads: [
+            ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y", "-threads", str(threads),
+            "-ss", "1", "-i", path, "-frames:v", "1", "-vf", "scale=320:-2", "-f", "mjpeg", tmp_path
+        ],
+        f"thumbnail {digest[:8]}", allocator, timeout=60
+    )
+    if result.returncode != 0 or not os.path.exists(tmp_path):
+        raise RuntimeError(result.stderr.decode(errors="ignore").strip() or "ffmpeg gagal membuat thumbnail")
+    os.replace(tmp_path, output)
+    return output
+
+async def run_job(func, *args):
+    """Jalankan pekerjaan berat di pool worker terbatas (MAX_JOBS sekaligus), tanpa memblok bot."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args))
+
+def remove_thumbnail(digest):
+    try:
+        os.remove(thumbnail_path(digest))
+    except OSError:
+        pass
+
+def cleanup_incoming():
+    """Hapus sisa unduhan yang terputus (bot mati saat upload)."""
+    if not os.path.isdir(INCOMING_DIR):
+        return
+    for name in os.listdir(INCOMING_DIR):
+        if name.endswith(".part"):
+            try:
+                os.remove(os.path.join(INCOMING_DIR, name))
+            except OSError:
+                pass
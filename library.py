@@ -0,0 +1,215 @@
+import os, json, time, threading
+import transcode_cache
+
+# Index disimpan di samping streaming.json
+LIBRARY_FILE = 'library.json'
+VIDEO_DIR = 'videos'
+SUPPORTED_EXT = ('.mp4', '.mkv', '.mov', '.avi', '.flv', '.webm')
+
+_lock = threading.Lock()
+
+def load_library():
+    if not os.path.exists(LIBRARY_FILE):
+        return {"files": {}}
+    with open(LIBRARY_FILE, 'r') as f:
+        library = json.load(f)
+    library.setdefault("files", {})
+    return library
+
+def save_library(library):
+    tmp_path = LIBRARY_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(library, f, indent=2)
+    os.replace(tmp_path, LIBRARY_FILE)
+
+def library_key(path):
+    return os.path.abspath(path)
+
+def orientation_of(width, height):
+    if not width or not height:
+        return None
+    if width == height:
+        return "square"
+    return "portrait" if height > width else "landscape"
+
+def is_fresh(entry, stat):
+    """Entry masih berlaku jika ukuran & mtime file belum berubah."""
+    return entry is not None and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime
+
+def probe_entry(path, stat):
+    """Probe satu file (hash + ffprobe). Gagal probe tetap dicatat agar tidak diulang sampai file berubah."""
+    from livestream import probe_video, find_ffprobe
+    from ffmpeg_caps import CapabilityError
+
+    entry = {
+        "path": path,
+        "name": os.path.basename(path),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "sha256": transcode_cache.file_hash(path),
+        "updated": time.time(),
+        "error": None,
+    }
+    try:
+        ffprobe_path = find_ffprobe()
+    except CapabilityError as e:
+        # ffprobe belum terpasang: jangan disimpan sebagai gagal, probe lagi nanti
+        entry["error"] = str(e)
+        entry["mtime"] = None
+        return entry
+    try:
+        info = probe_video(path, ffprobe_path)
+    except Exception as e:
+        entry["error"] = str(e)
+        return entry
+    entry.update(info)
+    entry["orientation"] = orientation_of(info["width"], info["height"])
+    return entry
+
+def update(path):
+    """Tambah / perbarui satu file di index (dipanggil setelah upload). Return entry atau None."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        remove(path)
+        return None
+    key = library_key(path)
+    with _lock:
+        entry = load_library()["files"].get(key)
+    if is_fresh(entry, stat):
+        return entry
+    print(f"[INFO] Library: probe {path}")
+    entry = probe_entry(path, stat)
+    with _lock:
+        library = load_library()
+        library["files"][key] = entry
+        save_library(library)
+    return entry
+
+def remove(path):
+    with _lock:
+        library = load_library()
+        if library["files"].pop(library_key(path), None) is not None:
+            save_library(library)
+
+def probe(path):
+    """Seperti probe_video tapi memakai index. Raise RuntimeError jika file tidak bisa dibaca."""
+    entry = update(path)
+    if entry is None:
+        raise RuntimeError(f"[ERROR] File video tidak ditemukan: {path}")
+    if entry.get("error"):
+        raise RuntimeError(entry["error"])
+    return entry
+
+def scan_paths(base_dir=VIDEO_DIR):
+    """Path semua video di folder (hanya nama file, tanpa probe)."""
+    paths = []
+    for root, _, files in os.walk(base_dir):
+        for file in files:
+            if file.lower().endswith(SUPPORTED_EXT):
+                paths.append(os.path.join(root, file))
+    return paths
+
+def sync(base_dir=VIDEO_DIR):
+    """Samakan index dengan isi folder: file baru / berubah di-probe, file yang hilang dihapus."""
+    if not os.path.isdir(base_dir):
+        return []
+    paths = scan_paths(base_dir)
+    base = library_key(base_dir) + os.sep
+    with _lock:
+        library = load_library()
+        wanted = {library_key(path) for path in paths}
+        stale = [key for key in library["files"] if key.startswith(base) and key not in wanted]
+        for key in stale:
+            del library["files"][key]
+        if stale:
+            save_library(library)
+    for path in paths:
+        update(path)
+    return list_entries(base_dir)
+
+def find_by_hash(digest, base_dir=VIDEO_DIR):
+    """Entry video dengan isi yang sama (sha256), atau None."""
+    for entry in list_entries(base_dir):
+        if entry.get("sha256") == digest:
+            return entry
+    return None
+
+def list_entries(base_dir=VIDEO_DIR):
+    """Daftar video dari index. File yang berubah di-probe ulang, yang hilang dibuang, dan file baru
+    di folder (mis. disalin manual saat bot berjalan) ditambahkan; file yang sudah ter-index tidak di-probe ulang.
+
+    Bisa memblok lama (ffprobe + hash file baru / berubah): dari event loop panggil lewat asyncio.to_thread.
+    """
+    base = library_key(base_dir) + os.sep
+    paths = scan_paths(base_dir)
+    with _lock:
+        files = load_library()["files"]
+        entries = [entry for key, entry in files.items() if key.startswith(base)]
+        new_paths = [path for path in paths if library_key(path) not in files]
+    result = [update(path) for path in new_paths]
+    for entry in entries:
+        try:
+            stat = os.stat(entry["path"])
+        except FileNotFoundError:
+            remove(entry["path"])
+            continue
+        result.append(entry if is_fresh(entry, stat) else update(entry["path"]))
+    return sorted((entry for entry in result if entry), key=lambda entry: entry["name"].lower())
+
+def describe(entry):
+    """Ringkasan pendek untuk tombol / daftar video di bot, mis. '00:03:12 · 1280x720 · 60fps'."""
+    from livestream import format_duration
+    if not entry or entry.get("error"):
+        return "?"
+    parts = [format_duration(entry["duration"]) if entry.get("duration") else "--:--:--"]
+    if entry.get("width"):
+        parts.append(f"{entry['width']}x{entry['height']}")
+    if entry.get("fps"):
+        parts.append(f"{entry['fps']:.0f}fps")
+    return " · ".join(parts)
+
+def check_entry(entry, quality, mode):
+    """Daftar ketidakcocokan video dengan preset & mode yang dipilih (kosong jika cocok)."""
+    from livestream import YOUTUBE_PRESET, adjust_resolution_for_mode
+    if not entry:
+        return ["file tidak ditemukan"]
+    if entry.get("error"):
+        return [f"tidak bisa dibaca ffprobe: {entry['error'].splitlines()[0]}"]
+
+    preset = YOUTUBE_PRESET.get(quality, YOUTUBE_PRESET["720p60"])
+    width, height = map(int, adjust_resolution_for_mode(preset["resolution"], mode).split("x"))
+    warnings = []
+    if entry.get("orientation") in ("portrait", "landscape") and entry["orientation"] != mode:
+        warnings.append(f"video {entry['orientation']} tapi mode live {mode}")
+    if entry.get("width") and (entry["width"] < width and entry["height"] < height):
+        warnings.append(f"resolusi {entry['width']}x{entry['height']} lebih kecil dari {width}x{height} (di-upscale)")
+    if entry.get("fps") and entry["fps"] < float(preset["fps"]) - 0.5:
+        warnings.append(f"fps {entry['fps']:.0f} di bawah {preset['fps']} (frame diduplikasi)")
+    if not entry.get("audio_codec"):
+        warnings.append("tanpa audio")
+    return warnings
+
+def check_config(config):
+    """Cek semua video yang akan diputar sesi (video tunggal atau isi playlist).
+
+    Return list (nama file, [peringatan]) hanya untuk file yang bermasalah.
+    """
+    from livestream import get_playlist
+    quality = config.get("resolution", "720p60")
+    mode = config.get("mode", "landscape")
+    if config.get("playlist_enabled"):
+        paths = get_playlist(config)
+    else:
+        paths = [config["video_path"]] if config.get("video_path") else []
+    problems = []
+    for path in dict.fromkeys(paths):
+        warnings = check_entry(update(path), quality, mode)
+        if warnings:
+            problems.append((os.path.basename(path), warnings))
+    return problems
+
+if __name__ == "__main__":
+    # Pemakaian: python library.py  (scan ulang folder videos & tampilkan isi index)
+    for entry in sync():
+        print(f"{entry['name']}: {describe(entry)}{' [' + entry['error'] + ']' if entry.get('error') else ''}")
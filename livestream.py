@@ -1,55 +1,71 @@
-import subprocess, json, asyncio, signal, time, os
-import shutil
-import platform
+import subprocess, json, asyncio, time, os, random, uuid
 import psutil
+import transcode_cache
+import adaptive_quality
+import relay
+import library
+import ffmpeg_caps
+import benchmark
+import cpu_alloc
+import runtime_state
+import config_store
+import session_log
+from proc_utils import read_lines, terminate_process, backoff_delay, RetryWindow
 
-CONFIG_FILE = 'streaming.json'
-ffmpeg_process = None
+CONFIG_FILE = config_store.CONFIG_FILE
+DEFAULT_SESSION = config_store.DEFAULT_SESSION
+# Encoder menyerah jika gagal lebih dari MAX_RETRIES kali dalam RETRY_WINDOW detik
 MAX_RETRIES = 3
-streaming_active = False
+RETRY_WINDOW = 600
+RETRY_DELAY_MAX = 30
+# Ukuran potongan saat mengirim item playlist ke stdin encoder
+PLAYLIST_CHUNK = 256 * 1024
+# Encoder dianggap stabil (backoff direset) jika sudah berjalan selama ini (detik)
+STABLE_SECONDS = 30
 
-send_status_message = None
-current_user_id = None
+# Batas maksimum jarak keyframe (detik) agar source bisa di-copy langsung ke RTMP
+MAX_GOP_SECONDS = 4
 
-def set_notifier(notifier_func, user_id):
-    global send_status_message, current_user_id
-    send_status_message = notifier_func
-    current_user_id = user_id
+# Perkiraan pemakaian core CPU per sesi (libx264 veryfast), dipakai untuk batas sesi per host
+PRESET_CPU_COST = {"480p30": 0.6, "480p": 1.0, "720p60": 2.0, "1080p60": 3.5}
+COPY_CPU_COST = 0.2
+# Core yang disisakan untuk bot Telegram & sistem
+CPU_RESERVE = 0.5
 
-def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        raise FileNotFoundError(f"[ERROR] Config file '{CONFIG_FILE}' tidak ditemukan.")
-    with open(CONFIG_FILE, 'r') as f:
-        return json.load(f)
+class StreamLimitError(Exception):
+    pass
+
+def load_sessions():
+    """Semua sesi dari config store (streaming.json dibaca sekali, lalu disimpan di memori)."""
+    return config_store.store.sessions()
+
+def load_config(session_name=DEFAULT_SESSION):
+    config = config_store.store.get(session_name)
+    if config is None:
+        if not load_sessions() and not os.path.exists(CONFIG_FILE):
+            raise FileNotFoundError(f"[ERROR] Config file '{CONFIG_FILE}' tidak ditemukan.")
+        raise KeyError(f"[ERROR] Sesi '{session_name}' tidak ada di {CONFIG_FILE}.")
+    return config
 
 def find_ffmpeg():
-    ffmpeg_in_path = shutil.which("ffmpeg")
-    if ffmpeg_in_path:
-        print(f"[INFO] ffmpeg ditemukan di PATH sistem: {ffmpeg_in_path}")
-        return ffmpeg_in_path
-
-    root_dir = os.path.dirname(os.path.abspath(__file__))
-    for dirpath, _, filenames in os.walk(root_dir):
-        for filename in filenames:
-            if filename.lower() in ("ffmpeg", "ffmpeg.exe"):
-                full_path = os.path.join(dirpath, filename)
-                print(f"[INFO] ffmpeg ditemukan di lokal folder: {full_path}")
-                return full_path
-
-    raise FileNotFoundError(
-        "[ERROR] ffmpeg executable tidak ditemukan.\n"
-        "Pastikan ffmpeg tersedia di PATH atau folder lokal project."
-    )
+    """Path ffmpeg dari hasil probe kemampuan (dicari sekali saat startup, lalu di-cache)."""
+    return ffmpeg_caps.get_capabilities()["ffmpeg"]
+
+def find_ffprobe():
+    # ffprobe dicari bersama ffmpeg saat probe kemampuan
+    return ffmpeg_caps.get_capabilities()["ffprobe"]
 
 def find_first_video(base_dir='videos'):
-    supported_ext = ('.mp4', '.mkv', '.mov', '.avi', '.flv', '.webm')
-    for root, _, files in os.walk(base_dir):
-        for file in files:
-            if file.lower().endswith(supported_ext):
-                return os.path.join(root, file)
-    return None
+    # Pakai index library, file baru di folder ikut di-index (memblok, panggil di thread)
+    entries = library.list_entries(base_dir)
+    return entries[0]["path"] if entries else None
 
 YOUTUBE_PRESET = {
+    "480p30": {
+        "resolution": "854x480", "fps": "30",
+        "video_bitrate": "1000k", "audio_bitrate": "128k",
+        "maxrate": "1500k", "bufsize": "3000k"
+    },
     "480p": {
         "resolution": "854x480", "fps": "60",
         "video_bitrate": "1500k", "audio_bitrate": "128k",
@@ -67,146 +83,966 @@ YOUTUBE_PRESET = {
     }
 }
 
+def destination_name(rtmp_url):
+    if "youtube" in rtmp_url:
+        return "YouTube"
+    if "facebook" in rtmp_url:
+        return "Facebook"
+    return rtmp_url.split("://")[-1].split("/")[0]
+
+def get_destinations(config):
+    """Daftar tujuan RTMP: tujuan utama (rtmp_url/stream_key) + extra_destinations."""
+    destinations = []
+    if config.get("rtmp_url") and config.get("stream_key"):
+        destinations.append({
+            "name": destination_name(config["rtmp_url"]),
+            "url": f"{config['rtmp_url'].rstrip('/')}/{config['stream_key']}",
+        })
+    for dest in config.get("extra_destinations", []):
+        destinations.append({
+            "name": dest.get("name") or destination_name(dest["rtmp_url"]),
+            "url": f"{dest['rtmp_url'].rstrip('/')}/{dest['stream_key']}",
+        })
+    # Nama harus unik karena dipakai sebagai key status
+    seen = {}
+    for dest in destinations:
+        count = seen.get(dest["name"], 0) + 1
+        seen[dest["name"]] = count
+        if count > 1:
+            dest["name"] = f"{dest['name']} #{count}"
+    return destinations
+
+def build_tee_output(ports):
+    """Output tee: satu hasil encode dikirim ke beberapa port UDP lokal (satu per tujuan)."""
+    outputs = [f"[f=mpegts:onfail=ignore]udp://127.0.0.1:{port}?pkt_size=1316" for port in ports]
+    return ["-map", "0:v", "-map", "0:a?", "-f", "tee", "|".join(outputs)]
+
 def adjust_resolution_for_mode(resolution: str, mode: str) -> str:
     if mode == "portrait":
         width, height = resolution.split("x")
         return f"{height}x{width}"
     return resolution
 
-async def start_streaming():
-    global ffmpeg_process, streaming_active
-    streaming_active = True
+def parse_frame_rate(value):
+    if not value or value == "0/0":
+        return None
+    if "/" in value:
+        num, den = value.split("/", 1)
+        if float(den) == 0:
+            return None
+        return float(num) / float(den)
+    return float(value)
 
+def parse_bitrate(value):
+    """Ubah bitrate preset seperti '4500k' menjadi bit per detik."""
+    value = str(value).strip().lower()
+    if value.endswith("k"):
+        return int(float(value[:-1]) * 1000)
+    if value.endswith("m"):
+        return int(float(value[:-1]) * 1000000)
+    return int(value)
+
+def probe_video(video_path, ffprobe_path):
+    """Ambil info codec, resolusi, fps, bitrate dan jarak keyframe dari file video."""
+    result = subprocess.run(
+        [ffprobe_path, "-v", "error", "-show_streams", "-show_format", "-of", "json", video_path],
+        capture_output=True, timeout=30
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"[ERROR] ffprobe gagal membaca {video_path}: {result.stderr.decode(errors='ignore').strip()}")
+    data = json.loads(result.stdout or b"{}")
+
+    video = next((st for st in data.get("streams", []) if st.get("codec_type") == "video"), None)
+    audio = next((st for st in data.get("streams", []) if st.get("codec_type") == "audio"), None)
+    fmt = data.get("format", {})
+    if not video:
+        raise RuntimeError(f"[ERROR] Tidak ada stream video di {video_path}")
+
+    width, height = int(video.get("width", 0)), int(video.get("height", 0))
+    rotation = int(video.get("tags", {}).get("rotate", 0) or 0)
+    for side_data in video.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = int(side_data["rotation"])
+    if abs(rotation) % 180 == 90:
+        width, height = height, width
+
+    video_bitrate = video.get("bit_rate") or fmt.get("bit_rate")
+
+    return {
+        "video_codec": video.get("codec_name"),
+        "audio_codec": audio.get("codec_name") if audio else None,
+        "width": width,
+        "height": height,
+        "fps": parse_frame_rate(video.get("avg_frame_rate")) or parse_frame_rate(video.get("r_frame_rate")),
+        "video_bitrate": int(video_bitrate) if video_bitrate else None,
+        "duration": float(fmt["duration"]) if fmt.get("duration") else None,
+        "gop_seconds": probe_max_keyframe_interval(video_path, ffprobe_path),
+    }
+
+def probe_max_keyframe_interval(video_path, ffprobe_path, scan_seconds=60):
+    """Hitung jarak keyframe terpanjang pada awal video (cukup beberapa detik pertama)."""
+    result = subprocess.run(
+        [ffprobe_path, "-v", "error", "-select_streams", "v:0", "-skip_frame", "nokey",
+         "-read_intervals", f"%+{scan_seconds}",
+         "-show_entries", "frame=best_effort_timestamp_time", "-of", "csv=p=0", video_path],
+        capture_output=True, timeout=60
+    )
+    if result.returncode != 0:
+        return None
+    times = []
+    for line in result.stdout.decode(errors="ignore").splitlines():
+        line = line.strip().strip(",")
+        try:
+            times.append(float(line))
+        except ValueError:
+            continue
+    if len(times) < 2:
+        return None
+    return max(b - a for a, b in zip(times, times[1:]))
+
+def check_passthrough(info, preset, final_resolution):
+    """Cek apakah video sudah sesuai preset sehingga cukup di-copy (tanpa encode ulang).
+
+    Return (True, None) jika cocok, atau (False, alasan) jika harus di-encode.
+    """
+    if info.get("video_codec") != "h264":
+        return False, f"codec video {info.get('video_codec')} bukan h264"
+    if info.get("audio_codec") not in (None, "aac"):
+        return False, f"codec audio {info.get('audio_codec')} bukan aac"
+    if f"{info['width']}x{info['height']}" != final_resolution:
+        return False, f"resolusi {info['width']}x{info['height']} bukan {final_resolution}"
+    if not info.get("fps") or abs(info["fps"] - float(preset["fps"])) > 0.01:
+        return False, f"fps {info.get('fps')} bukan {preset['fps']}"
+    if not info.get("video_bitrate") or info["video_bitrate"] > parse_bitrate(preset["maxrate"]):
+        return False, f"bitrate {info.get('video_bitrate')} melebihi {preset['maxrate']}"
+    if not info.get("gop_seconds") or info["gop_seconds"] > MAX_GOP_SECONDS:
+        return False, f"jarak keyframe {info.get('gop_seconds')}s melebihi {MAX_GOP_SECONDS}s"
+    return True, None
+
+def select_encode_path(input_file, preset, final_resolution):
+    """Pilih jalur 'copy' (passthrough) atau 'encode' (libx264 + aac) untuk sebuah video."""
     try:
-        config = load_config()
-        ffmpeg_path = find_ffmpeg()
+        # Hasil probe diambil dari index library, ffprobe hanya jalan jika file berubah
+        info = library.probe(input_file)
     except Exception as e:
-        print(str(e))
-        if send_status_message:
-            asyncio.create_task(send_status_message(current_user_id, f"🚫 Gagal memulai live: {str(e)}"))
-        return
+        print(f"[WARN] Probe video gagal, pakai encode ulang: {e}")
+        return "encode", str(e)
+    use_copy, reason = check_passthrough(info, preset, final_resolution)
+    return ("copy", None) if use_copy else ("encode", reason)
 
-    url = f"{config['rtmp_url']}/{config['stream_key']}"
-    quality = config.get("resolution", "720p60")
+def describe_encode_path(config):
+    """Keterangan jalur encode untuk konfigurasi streaming (dipakai di tampilan bot)."""
     input_file = config.get("video_path")
+    if not input_file or not os.path.exists(input_file):
+        return "-"
+    quality = config.get("resolution", "720p60")
     mode = config.get("mode", "landscape")
-    looping = config.get("looping", False)
+    if transcode_cache.lookup(input_file, quality, mode):
+        return format_encode_path("cache")
+    preset = YOUTUBE_PRESET.get(quality, YOUTUBE_PRESET["720p60"])
+    final_resolution = adjust_resolution_for_mode(preset["resolution"], mode)
+    path, reason = select_encode_path(input_file, preset, final_resolution)
+    return format_encode_path(path, reason)
+
+def format_encode_path(path, reason=None):
+    if path == "playlist":
+        return "Playlist, stream copy dari cache MPEG-TS"
+    if path == "cache":
+        return "Stream copy dari cache transcode"
+    if path == "copy":
+        return "Stream copy (tanpa encode ulang)"
+    if path == "encode":
+        return f"Encode ulang libx264/aac ({reason})" if reason else "Encode ulang libx264/aac"
+    return "-"
+
+def build_encode_args(preset, final_resolution, threads=None):
+    """Parameter encode libx264/aac untuk preset (dipakai live & benchmark)."""
+    return [
+        "-s", final_resolution,
+        "-r", preset["fps"],
+        "-c:v", "libx264", "-preset", "veryfast",
+    ] + (["-threads", str(threads)] if threads else []) + [
+        "-b:v", preset["video_bitrate"],
+        "-maxrate", preset["maxrate"],
+        "-bufsize", preset["bufsize"],
+        "-c:a", "aac", "-b:a", preset["audio_bitrate"],
+    ]
+
+def build_ffmpeg_command(ffmpeg_path, input_file, output, preset, final_resolution, looping, encode_path,
+                         start_offset=0, threads=None):
+    """Susun command ffmpeg. output = URL RTMP tunggal atau list port UDP untuk fan-out (tee)."""
+    # Statistik dibaca dari -progress (stdout), stderr hanya berisi log/warning
+    cmd = [ffmpeg_path, "-progress", "pipe:1", "-nostats"]
+    if encode_path == "playlist":
+        # Input MPEG-TS dari stdin; timestamp tiap item mulai dari nol lagi sehingga
+        # lompatan > 1 detik dianggap diskontinuitas dan disambung oleh ffmpeg
+        cmd += ["-re", "-dts_delta_threshold", "1", "-f", "mpegts", "-i", "pipe:0"]
+    else:
+        cmd += ["-re", "-stream_loop", "-1" if looping else "0"]
+        if start_offset:
+            cmd += ["-ss", f"{start_offset:.3f}"]
+        cmd += ["-i", input_file]
+    if encode_path in ("copy", "cache", "playlist"):
+        cmd += ["-c", "copy"]
+    else:
+        cmd += build_encode_args(preset, final_resolution, threads)
+    if isinstance(output, list):
+        cmd += build_tee_output(output)
+    else:
+        cmd += ["-f", "flv", output]
+    return cmd
+
+def get_playlist(config):
+    """Daftar video playlist yang masih ada di disk, sesuai urutan."""
+    return [path for path in config.get("playlist", []) if os.path.exists(path)]
+
+def estimate_cpu_cost(config):
+    """Perkiraan core CPU yang dibutuhkan satu sesi."""
+    if config.get("playlist_enabled") and get_playlist(config):
+        return COPY_CPU_COST
+    quality = config.get("resolution", "720p60")
+    video_path = config.get("video_path")
+    if video_path and os.path.exists(video_path):
+        if transcode_cache.lookup(video_path, quality, config.get("mode", "landscape")):
+            return COPY_CPU_COST
+    return preset_cpu_cost(quality)
+
+def preset_cpu_cost(quality):
+    """Core CPU untuk encode satu stream preset ini: hasil benchmark host jika ada, selain itu perkiraan umum."""
+    measured = benchmark.preset_cost(quality)
+    if measured is not None:
+        return measured
+    return PRESET_CPU_COST.get(quality, PRESET_CPU_COST["720p60"])
+
+def parse_progress(block):
+    """Ubah satu blok output -progress ffmpeg (key=value) menjadi angka metrik."""
+    def number(key, suffix=""):
+        value = block.get(key, "").strip()
+        if suffix and value.endswith(suffix):
+            value = value[:-len(suffix)]
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    return {
+        "frame": number("frame"),
+        "fps": number("fps"),
+        "speed": number("speed", "x"),
+        "bitrate_kbps": number("bitrate", "kbits/s"),
+        "drop_frames": number("drop_frames"),
+        "dup_frames": number("dup_frames"),
+        "total_size": number("total_size"),
+        "out_time": block.get("out_time", "").strip(),
+        "out_time_seconds": (number("out_time_us") or 0) / 1000000,
+    }
+
+def format_size(num_bytes):
+    if num_bytes is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.1f}{unit}" if unit != "B" else f"{int(num_bytes)}B"
+        num_bytes /= 1024
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def format_metrics(session):
+    """Ringkasan metrik encoder untuk Cek Status Live."""
+    m = session.metrics
+    def show(key, fmt="{:.0f}"):
+        return fmt.format(m[key]) if m.get(key) is not None else "-"
+
+    uptime = format_duration(time.time() - session.started_at) if session.started_at else "-"
+    return (
+        f"FPS: {show('fps', '{:.1f}')} | Speed: {show('speed', '{:.2f}x')}\n"
+        f"Bitrate: {show('bitrate_kbps', '{:.0f} kbps')}\n"
+        f"Drop/Dup: {show('drop_frames')}/{show('dup_frames')}\n"
+        f"Output: {format_size(m.get('total_size'))} | Waktu: {m.get('out_time') or '-'}\n"
+        f"Uptime: {uptime} | Restart: {session.restarts}\n"
+        f"CPU: {show('cpu_percent', '{:.0f}%')} | RAM: {format_size(m.get('rss'))}\n"
+    )
+
+def format_allocation(session):
+    """Alokasi CPU sesi (core, thread x264, nice) dibanding pemakaian terukur."""
+    allocation = session.allocation
+    if not allocation:
+        return "-"
+    usage = session.metrics.get("cpu_percent")
+    return (
+        f"Core {cpu_alloc.format_cores(allocation['cores'])} | "
+        f"{allocation['threads'] or '-'} thread x264 | nice {allocation['nice']}\n"
+        f"Jatah ±{allocation['cost']:.1f} core | terpakai "
+        f"{f'{usage / 100:.1f} core ({usage:.0f}%)' if usage is not None else '-'}\n"
+    )
+
+class StreamSession:
+    """Satu live stream: config, proses ffmpeg, relay, retry dan notifier sendiri."""
+
+    def __init__(self, name, notifier=None, user_id=None, allocator=None, log=None):
+        self.name = name
+        self.session_id = uuid.uuid4().hex[:12]
+        self.notifier = notifier
+        self.user_id = user_id
+        self.config = {}
+        self.config_version = None
+        self.process = None
+        self.active = False
+        self.encode_path = None
+        self.restarts = 0
+        self.metrics = {}
+        self.cpu_cost = 0
+        self.quality = None
+        self.source_file = None
+        self.start_offset = 0
+        self.controller = None
+        self.pending_quality = None
+        # Future hasil ganti preset dari switch_quality (preset baru, atau None jika live berhenti duluan)
+        self.quality_switch = None
+        self.settled_quality = None
+        self.playlist_item = None
+        self.playlist_next = None
+        self.playlist_index = 0
+        self.started_at = None
+        self.relays = []
+        self.allocator = allocator
+        self.allocation = None
+        self.failures = RetryWindow(MAX_RETRIES, RETRY_WINDOW)
+        # Output ffmpeg (encoder & relay) terakhir, untuk menu Log di bot
+        self.log = log or session_log.LogBuffer()
+        self.task = None
+        self._stop_event = asyncio.Event()
+
+    def notify(self, message):
+        if self.notifier:
+            result = self.notifier(self.user_id, f"[{self.name}] {message}")
+            # Notifier batch (Notifier.push) langsung kembali; notifier berupa coroutine dijalankan sebagai task
+            if asyncio.iscoroutine(result):
+                asyncio.create_task(result)
+
+    @property
+    def destination_status(self):
+        return {r.name: r.snapshot() for r in self.relays}
+
+    async def start_relays(self, ffmpeg_path, destinations, preset):
+        """Buat relay per tujuan. Return daftar port UDP lokal untuk output encoder (tee)."""
+        buffer_bytes = (parse_bitrate(preset["maxrate"]) + parse_bitrate(preset["audio_bitrate"])) \
+            // 8 * relay.RELAY_BUFFER_SECONDS
+        ports = []
+        for dest in destinations:
+            r = relay.Relay(self.name, dest, ffmpeg_path, buffer_bytes, self.notify, self.pusher_allocation(), self.log)
+            ports.append(await r.start())
+            self.relays.append(r)
+        return ports
+
+    def allocate_cpu(self, encode_path, quality):
+        """Ambil jatah core, thread & nice sesuai jalur encode & preset (dipanggil tiap preset berubah)."""
+        if not self.allocator:
+            return
+        encode = encode_path == "encode"
+        cost = preset_cpu_cost(quality) if encode else COPY_CPU_COST
+        self.allocation = self.allocator.allocate(self.name, cost, encode)
+        for r in self.relays:
+            r.allocation = self.pusher_allocation()
+        print(f"[INFO] [{self.name}] Alokasi CPU: core {cpu_alloc.format_cores(self.allocation['cores'])}, "
+              f"{self.allocation['threads'] or '-'} thread, nice {self.allocation['nice']}")
+
+    def pusher_allocation(self):
+        # Pusher (stream copy) memakai core yang sama dengan encoder sesi ini
+        if not self.allocation:
+            return None
+        return {**self.allocation, "threads": None, "nice": cpu_alloc.COPY_NICE}
+
+    async def stop_relays(self):
+        await asyncio.gather(*(r.stop() for r in self.relays), return_exceptions=True)
+        self.relays = []
+
+    def is_running(self):
+        return self.active and self.process is not None and self.process.returncode is None
+
+    async def wait_or_stop(self, delay):
+        """Tunggu `delay` detik, tapi langsung kembali jika sesi dihentikan."""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def read_progress(self, process):
+        """Baca -progress ffmpeg dan simpan metrik terbaru (plus CPU & RSS proses via psutil)."""
+        try:
+            ps_process = psutil.Process(process.pid)
+            ps_process.cpu_percent(interval=None)
+        except psutil.Error:
+            ps_process = None
 
-    if not input_file:
-        input_file = find_first_video()
-        if input_file:
-            print(f"[INFO] File video ditemukan otomatis: {input_file}")
+        block = {}
+        async for line in read_lines(process.stdout):
+            key, _, value = line.partition("=")
+            block[key.strip()] = value
+            if key.strip() != "progress":
+                continue
+
+            metrics = parse_progress(block)
+            block = {}
+            if ps_process:
+                try:
+                    with ps_process.oneshot():
+                        metrics["cpu_percent"] = ps_process.cpu_percent(interval=None)
+                        metrics["rss"] = ps_process.memory_info().rss
+                except psutil.Error:
+                    ps_process = None
+            metrics["updated_at"] = time.time()
+            self.metrics = metrics
+            self.on_metrics(metrics)
+
+    def choose_next_item(self, config, looping):
+        """Tentukan item berikutnya dari playlist terbaru (perubahan dari bot berlaku di sini)."""
+        playlist = get_playlist(config)
+        if not playlist:
+            return None
+        if config.get("shuffle"):
+            if self.playlist_next in playlist and self.playlist_next != self.playlist_item:
+                return self.playlist_next
+            return random.choice([path for path in playlist if path != self.playlist_item] or playlist)
+        if self.playlist_item in playlist:
+            index = playlist.index(self.playlist_item) + 1
+        else:
+            # Item yang sedang diputar dihapus dari playlist: lanjut ke posisi yang sama
+            index = self.playlist_index
+        if index >= len(playlist):
+            if not looping:
+                return None
+            index = 0
+        return playlist[index]
+
+    def reload_config(self):
+        """Config terbaru sesi ini; hanya disalin ulang dari store jika versinya berubah."""
+        version = config_store.store.version_of(self.name)
+        if version == self.config_version:
+            return self.config
+        try:
+            self.config = load_config(self.name)
+            self.config_version = version
+        except (KeyError, FileNotFoundError, ValueError) as e:
+            print(f"[WARN] [{self.name}] Gagal membaca ulang config, pakai yang lama: {e}")
+        return self.config
+
+    async def prepare_playlist_item(self, path, quality, mode, ffmpeg_path):
+        """Pastikan item sudah dinormalisasi ke MPEG-TS sesuai preset (transcode sekali, lalu cache)."""
+        cached = await asyncio.to_thread(transcode_cache.lookup, path, quality, mode, "mpegts")
+        if cached:
+            return cached
+        print(f"[INFO] [{self.name}] Menyiapkan item playlist: {path}")
+        max_bytes = int(float(self.config.get("cache_max_gb", transcode_cache.DEFAULT_CACHE_MAX_GB)) * 1024 ** 3)
+        return await asyncio.to_thread(
+            transcode_cache.prepare_video, path, quality, mode, ffmpeg_path, max_bytes, "mpegts", self.allocator
+        )
+
+    async def feed_playlist(self, process, quality, mode, ffmpeg_path, looping, resume=False):
+        """Kirim item playlist berurutan ke stdin encoder. Tidak ada restart proses antar item.
+
+        Return True jika playlist habis dengan normal (tanpa looping), False jika berhenti sebelum
+        waktunya (item gagal disiapkan / playlist dikosongkan), None jika encoder sudah mati duluan.
+        """
+        item = self.playlist_item if resume and self.playlist_item else \
+            self.choose_next_item(self.reload_config(), looping)
+        prefetch = None
+        try:
+            while self.active and item:
+                if prefetch and self.playlist_next == item:
+                    path = await prefetch
+                else:
+                    if prefetch:
+                        prefetch.cancel()
+                    path = await self.prepare_playlist_item(item, quality, mode, ffmpeg_path)
+                transcode_cache.pin(path)
+
+                config = self.reload_config()
+                playlist = get_playlist(config)
+                self.playlist_item = item
+                self.playlist_index = playlist.index(item) if item in playlist else self.playlist_index
+                self.playlist_next = self.choose_next_item(config, looping)
+                print(f"[INFO] [{self.name}] Playlist: {os.path.basename(item)}")
+                # Siapkan item berikutnya selama item ini diputar
+                prefetch = asyncio.create_task(
+                    self.prepare_playlist_item(self.playlist_next, quality, mode, ffmpeg_path)
+                ) if self.playlist_next else None
+
+                try:
+                    with open(path, "rb") as f:
+                        while self.active:
+                            chunk = await asyncio.to_thread(f.read, PLAYLIST_CHUNK)
+                            if not chunk:
+                                break
+                            process.stdin.write(chunk)
+                            await process.stdin.drain()
+                finally:
+                    transcode_cache.unpin(path)
+
+                item = self.choose_next_item(self.reload_config(), looping)
+            finished = not looping
+            if looping and self.active:
+                print(f"[WARN] [{self.name}] Playlist kosong, tidak ada item untuk diputar.")
+        except (BrokenPipeError, ConnectionResetError):
+            return None
+        except Exception as e:
+            print(f"[ERROR] [{self.name}] Playlist berhenti: {e}")
+            self.notify(f"🚫 Playlist berhenti: {e}")
+            finished = False
+        finally:
+            if prefetch:
+                prefetch.cancel()
+        # Tutup stdin agar encoder selesai; supervisor yang memutuskan lanjut atau tidak dari return value
+        if process.returncode is None:
+            process.stdin.close()
+        return finished
+
+    async def select_input(self, source_file, quality, mode):
+        """Pilih file input & jalur encode untuk preset: cache transcode, stream copy, atau encode ulang."""
+        preset = YOUTUBE_PRESET.get(quality, YOUTUBE_PRESET["720p60"])
+        final_resolution = adjust_resolution_for_mode(preset["resolution"], mode)
+
+        # Hash & probe file bisa lama untuk video besar, jalankan di luar event loop
+        cached_file = await asyncio.to_thread(transcode_cache.lookup, source_file, quality, mode)
+        if cached_file:
+            # Hasil prepare sudah sesuai preset, cukup di-loop dengan stream copy
+            print(f"[INFO] [{self.name}] Memakai file cache: {cached_file}")
+            transcode_cache.pin(cached_file)
+            encode_path, reason, input_file = "cache", None, cached_file
         else:
-            error_msg = "[ERROR] Tidak ditemukan file video di folder videos."
-            print(error_msg)
-            if send_status_message:
-                asyncio.create_task(send_status_message(current_user_id, f"🚫 {error_msg}"))
+            encode_path, reason = await asyncio.to_thread(
+                select_encode_path, source_file, preset, final_resolution
+            )
+            input_file = source_file
+        self.encode_path = encode_path
+        self.quality = quality
+        print(f"[INFO] [{self.name}] Preset {quality}, jalur encode: {format_encode_path(encode_path, reason)}")
+        return input_file, encode_path, preset, final_resolution
+
+    def on_metrics(self, metrics):
+        """Dipanggil tiap update -progress: jalankan auto kualitas jika aktif."""
+        if not self.controller or self.encode_path != "encode" or self.pending_quality:
             return
+        # Auto kualitas bisa dimatikan dari bot saat live tanpa restart
+        if not self.reload_config().get("auto_quality"):
+            return
+        new_quality = self.controller.observe(metrics)
+        if new_quality:
+            direction = "⬇️ diturunkan" if adaptive_quality.QUALITY_LADDER.index(new_quality) > \
+                adaptive_quality.QUALITY_LADDER.index(self.quality) else "⬆️ dinaikkan"
+            print(f"[INFO] [{self.name}] Auto kualitas: {self.quality} -> {new_quality} (speed {metrics.get('speed')}x)")
+            self.notify(
+                f"🤖 Kualitas {direction}: {self.quality} → {new_quality} "
+                f"(speed {metrics.get('speed')}x, drop {metrics.get('drop_frames') or 0:.0f})"
+            )
+            self.pending_quality = new_quality
+            # Encoder dihentikan dengan rapi, supervisor langsung start ulang dengan preset baru
+            asyncio.create_task(terminate_process(self.process))
+        elif self.controller.settled and self.settled_quality != self.quality:
+            self.settled_quality = self.quality
+            adaptive_quality.record_settled_quality(self.source_file, self.quality)
 
-    if not os.path.exists(input_file):
-        error_msg = f"[ERROR] File video tidak ditemukan: {input_file}"
-        print(error_msg)
-        if send_status_message:
-            asyncio.create_task(send_status_message(current_user_id, f"🚫 {error_msg}"))
-        return
+    def switch_quality(self, quality):
+        """Ganti preset saat live (mis. dari jadwal): encoder dijalankan ulang dari posisi terakhir.
 
-    preset = YOUTUBE_PRESET.get(quality, YOUTUBE_PRESET["720p60"])
-    final_resolution = adjust_resolution_for_mode(preset["resolution"], mode)
+        Return future yang selesai saat encoder sudah memakai preset baru (hasilnya preset tsb., atau
+        None jika live berhenti sebelum itu). Return None jika tidak bisa, termasuk mode playlist
+        (item cache MPEG-TS dibuat per preset, sesi harus di-Start ulang).
+        """
+        if not self.active or self.encode_path == "playlist" or quality == self.quality or quality not in YOUTUBE_PRESET:
+            return None
+        print(f"[INFO] [{self.name}] Ganti preset: {self.quality} -> {quality}")
+        self.pending_quality = quality
+        if self.quality_switch is None or self.quality_switch.done():
+            self.quality_switch = asyncio.get_running_loop().create_future()
+        # Jika encoder sedang menunggu backoff (sudah mati), preset diterapkan saat encoder start berikutnya
+        asyncio.create_task(terminate_process(self.process))
+        return self.quality_switch
+
+    def finish_quality_switch(self, quality):
+        if self.quality_switch and not self.quality_switch.done():
+            self.quality_switch.set_result(quality)
+        self.quality_switch = None
+
+    async def apply_pending_quality(self, source_file, input_file, encode_path, mode
+                    ):
+        """Pindah ke preset pending_quality: input & jalur encode dipilih ulang, CPU dialokasikan ulang.
 
-    while streaming_active:
-        retries = 0
-        while retries <= MAX_RETRIES and streaming_active:
-            print(f"[INFO] Starting stream in {mode.upper()} mode... Attempt {retries + 1}/{MAX_RETRIES + 1}")
-            cmd = [
-                ffmpeg_path, "-re", "-stream_loop", "-1" if looping else "0", "-i", input_file,
-                "-s", final_resolution,
-                "-r", preset["fps"],
-                "-c:v", "libx264", "-preset", "veryfast",
-                "-b:v", preset["video_bitrate"],
-                "-maxrate", preset["maxrate"],
-                "-bufsize", preset["bufsize"],
-                "-c:a", "aac", "-b:a", preset["audio_bitrate"],
-                "-f", "flv", url
-            ]
+        Return (input_file, encode_path, preset, final_resolution) yang baru.
+        """
+        quality = self.pending_quality
+        if encode_path == "cache":
+            transcode_cache.unpin(input_file)
+        selected = await self.select_input(source_file, quality, mode)
+        self.allocate_cpu(selected[1], quality)
+        if self.controller:
+            self.controller.switch(quality)
+        self.pending_quality = None
+        self.finish_quality_switch(quality)
+        return selected
+
+    def resume_offset(self, duration, looping):
+        """Posisi video untuk melanjutkan setelah ganti preset (-ss mencari keyframe terdekat)."""
+        position = self.start_offset + (self.metrics.get("out_time_seconds") or 0)
+        if duration:
+            if looping:
+                position %= duration
+            elif position >= duration - 1:
+                return None
+        elif looping:
+            return 0
+        return position
+
+    async def run(self):
+        # active sudah di-set oleh StreamManager.start; jika Stop datang sebelum task berjalan, selesai
+        if not self.active:
+            return
+        encode_path = input_file = source_file = None
+        failed = False
+        # Apa pun yang terjadi (error, Stop, crash), relay, core & record runtime selalu dilepas
+        try:
+            self.started_at = time.time()
 
             try:
-                ffmpeg_process = subprocess.Popen(
-                    cmd,
-                    stderr=subprocess.PIPE,
-                    bufsize=1
+                self.config_version = config_store.store.version_of(self.name)
+                self.config = config = load_config(self.name)
+                ffmpeg_path = find_ffmpeg()
+            except Exception as e:
+                print(str(e))
+                self.notify(f"🚫 Gagal memulai live: {str(e)}")
+                self.active = False
+                return
+
+            destinations = get_destinations(config)
+            quality = config.get("resolution", "720p60")
+            source_file = config.get("video_path")
+            mode = config.get("mode", "landscape")
+            looping = config.get("looping", False)
+
+            if not destinations:
+                error_msg = "[ERROR] Belum ada tujuan RTMP / stream key."
+                print(error_msg)
+                self.notify(f"🚫 {error_msg}")
+                self.active = False
+                return
+
+            playlist = get_playlist(config) if config.get("playlist_enabled") else []
+            if playlist:
+                # Mode playlist: item (MPEG-TS dari cache) dikirim berurutan ke stdin satu encoder
+                preset = YOUTUBE_PRESET.get(quality, YOUTUBE_PRESET["720p60"])
+                final_resolution = adjust_resolution_for_mode(preset["resolution"], mode)
+                input_file, encode_path = "pipe:0", "playlist"
+                self.encode_path, self.quality = encode_path, quality
+                print(f"[INFO] [{self.name}] Mode playlist: {len(playlist)} video")
+                self.allocate_cpu(encode_path, quality)
+            else:
+                if not source_file:
+                    source_file = await asyncio.to_thread(find_first_video)
+                    if source_file:
+                        print(f"[INFO] File video ditemukan otomatis: {source_file}")
+                    else:
+                        error_msg = "[ERROR] Tidak ditemukan file video di folder videos."
+                        print(error_msg)
+                        self.notify(f"🚫 {error_msg}")
+                        self.active = False
+                        return
+
+                if not os.path.exists(source_file):
+                    error_msg = f"[ERROR] File video tidak ditemukan: {source_file}"
+                    print(error_msg)
+                    self.notify(f"🚫 {error_msg}")
+                    self.active = False
+                    return
+
+                self.source_file = source_file
+                if config.get("auto_quality"):
+                    # Mulai dari preset terakhir yang stabil di host ini (jika lebih ringan dari pilihan admin)
+                    settled = adaptive_quality.get_settled_quality(source_file)
+                    ladder = adaptive_quality.QUALITY_LADDER
+                    if settled in ladder and quality in ladder and ladder.index(settled) > ladder.index(quality):
+                        print(f"[INFO] [{self.name}] Auto kualitas: mulai dari preset tersimpan {settled}")
+                        quality = settled
+                    self.controller = adaptive_quality.QualityController(quality)
+                    self.settled_quality = settled
+
+                input_file, encode_path, preset, final_resolution = await self.select_input(source_file, quality, mode)
+                self.allocate_cpu(encode_path, quality)
+
+            runtime_state.start_session(self.name, self.session_id, self.user_id)
+            # Encoder tidak pernah menulis langsung ke RTMP: output di-fan-out (tee) ke relay lokal per
+            # tujuan, sehingga koneksi yang putus tidak mematikan encoder
+            output = await self.start_relays(ffmpeg_path, destinations, preset)
+            print(f"[INFO] [{self.name}] Output ke {len(destinations)} tujuan: {', '.join(d['name'] for d in destinations)}")
+
+            duration = None
+            attempt = 0
+            while self.active:
+                if self.pending_quality and not playlist:
+                    # Ganti preset datang saat encoder tidak berjalan (backoff): terapkan sebelum start
+                    input_file, encode_path, preset, final_resolution = await self.apply_pending_quality(
+                        source_file, input_file, encode_path, mode
+                    )
+                    await asyncio.gather(*(r.restart(clear_buffer=True) for r in self.relays))
+                print(f"[INFO] [{self.name}] Starting stream in {mode.upper()} mode... "
+                      f"(gagal {self.failures.count()}/{MAX_RETRIES} dalam {RETRY_WINDOW}s)")
+                cmd = build_ffmpeg_command(
+                    ffmpeg_path, input_file, output, preset, final_resolution, looping, encode_path,
+                    start_offset=self.start_offset, threads=self.allocation["threads"] if self.allocation else None
                 )
-                print("[INFO] FFmpeg started.")
 
-                with open("ffmpeg.lock", "w") as f:
-                    f.write("live")
+                try:
+                    started = time.time()
+                    self.process = await asyncio.create_subprocess_exec(
+                        *cmd,
+                        stdin=asyncio.subprocess.PIPE if playlist else asyncio.subprocess.DEVNULL,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE
+                    )
+                    cpu_alloc.apply(self.process.pid, self.allocation)
+                    runtime_state.record_process(self.name, "encoder", self.process.pid)
+                    progress_task = asyncio.create_task(self.read_progress(self.process))
+                    if playlist:
+                        # Setelah encoder gagal, lanjutkan dari item yang sedang diputar
+                        feeder_task = asyncio.create_task(self.feed_playlist(
+                            self.process, quality, mode, ffmpeg_path, looping, resume=self.restarts > 0
+                        ))
+                    print(f"[INFO] [{self.name}] FFmpeg started.")
 
-                if send_status_message and retries == 0:
-                    asyncio.create_task(send_status_message(current_user_id, "✅ Live berhasil dimulai!"))
+                    if self.restarts == 0:
+                        self.notify("✅ Live berhasil dimulai!")
+
+                    async for line in read_lines(self.process.stderr):
+                        if self.log.add("encoder", line):
+                            print(f"[FFMPEG {self.name}]", line)
+
+                    returncode = await self.process.wait()
+                    await progress_task
+                    feed_finished = None
+                    if playlist:
+                        if feeder_task.done() and not feeder_task.cancelled() and not feeder_task.exception():
+                            feed_finished = feeder_task.result()
+                        feeder_task.cancel()
+                        await asyncio.gather(feeder_task, return_exceptions=True)
+                except Exception as e:
+                    print(f"[ERROR] [{self.name}] Gagal menjalankan FFmpeg: {e}")
+                    self.notify(f"🚫 Error FFmpeg: {str(e)}")
+                    break
+
+                if not self.active:
+                    break
+
+                if self.pending_quality:
+                    # Ganti preset: lanjutkan dari posisi terakhir, tidak dihitung sebagai gagal
+                    if duration is None:
+                        try:
+                            duration = (await asyncio.to_thread(library.probe, source_file))["duration"]
+                        except Exception as e:
+                            print(f"[WARN] [{self.name}] Durasi video tidak diketahui: {e}")
+                    offset = self.resume_offset(duration, looping)
+                    input_file, encode_path, preset, final_resolution = await self.apply_pending_quality(
+                        source_file, input_file, encode_path, mode
+                    )
+                    self.restarts += 1
+                    if offset is None:
+                        print(f"[INFO] [{self.name}] Streaming ended normally.")
+                        break
+                    self.start_offset = offset
+                    # Parameter video berubah: pusher disambung ulang agar header FLV sesuai preset baru
+                    await asyncio.gather(*(r.restart(clear_buffer=True) for r in self.relays))
+                    continue
 
-                while streaming_active:
-                    if ffmpeg_process.poll() is not None:
+                self.start_offset = 0
+                # Playlist yang berhenti bukan karena habis (item gagal / playlist kosong) tetap dihitung
+                # gagal walau encoder keluar dengan 0, agar tidak di-start ulang terus tanpa jeda
+                feed_stopped = playlist and feed_finished is not True
+                if returncode == 0 and not feed_stopped:
+                    print(f"[INFO] [{self.name}] Streaming ended normally.")
+                    if not looping:
                         break
-                    line = ffmpeg_process.stderr.readline()
-                    if line:
-                        print("[FFMPEG]", line.decode(errors="ignore").strip())
-
-                returncode = ffmpeg_process.returncode
-                if returncode != 0:
-                    print(f"[WARN] FFmpeg exited with code {returncode}")
-                    retries += 1
-                    time.sleep(3)
+                    continue
+
+                if returncode == 0:
+                    print(f"[WARN] [{self.name}] Playlist berhenti sebelum selesai")
                 else:
-                    print("[INFO] Streaming ended normally.")
+                    print(f"[WARN] [{self.name}] FFmpeg exited with code {returncode}")
+                self.restarts += 1
+                if time.time() - started >= STABLE_SECONDS:
+                    attempt = 0
+                attempt += 1
+                self.failures.record()
+                if self.failures.exceeded():
+                    failed = True
                     break
+                await self.wait_or_stop(backoff_delay(attempt, maximum=RETRY_DELAY_MAX))
 
-            except Exception as e:
-                print(f"[ERROR] Gagal menjalankan FFmpeg: {e}")
-                if send_status_message:
-                    asyncio.create_task(send_status_message(current_user_id, f"🚫 Error FFmpeg: {str(e)}"))
-                break
+        except Exception as e:
+            print(f"[ERROR] [{self.name}] Supervisor berhenti karena error: {e}")
+            self.notify(f"🚫 Live berhenti karena error: {e}")
+        finally:
+            self.active = False
+            self._stop_event.set()
+            await self.stop_relays()
+            if self.allocator:
+                self.allocator.release(self.name)
+            self.allocation = None
+            runtime_state.end_session(self.name)
+            self.playlist_item = self.playlist_next = None
+            self.pending_quality = None
+            self.finish_quality_switch(None)
+            if encode_path == "cache":
+                transcode_cache.unpin(input_file)
+            self.encode_path = None
+            if self.controller and self.settled_quality != self.quality and \
+                    time.time() - self.controller.last_switch >= adaptive_quality.SETTLE_SECONDS:
+                adaptive_quality.record_settled_quality(source_file, self.quality)
+
+            if failed:
+                self.notify(f"🚫 Gagal menjalankan live: encoder gagal lebih dari {MAX_RETRIES}x dalam {RETRY_WINDOW // 60} menit.")
+
+    async def stop(self):
+        was_active = self.active
+        self.active = False
+        self._stop_event.set()
+        if self.process and self.process.returncode is None:
+            print(f"[INFO] [{self.name}] Stopping stream...")
+            await terminate_process(self.process)
+        await self.stop_relays()
+        if self.task:
+            # Tunggu supervisor selesai membersihkan runtime state & cache pin
+            await asyncio.gather(self.task, return_exceptions=True)
+        self.process = None
+        # Stop dari admin: jangan sampai sesi ini dilanjutkan otomatis saat bot start berikutnya
+        runtime_state.end_session(self.name)
+
+        if was_active:
+            print(f"[INFO] [{self.name}] Stream stopped.")
+            self.notify("🛑 Live streaming dihentikan.")
+
+class StreamManager:
+    """Pengelola banyak sesi live dalam satu host, dengan batas sesuai sisa CPU."""
+
+    def __init__(self, max_sessions=None):
+        self.sessions = {}
+        self.max_sessions = max_sessions
+        # Log per nama sesi, tetap ada saat sesi di-Start ulang
+        self.logs = {}
+        # Pembagian core antar sesi; None = tanpa pinning (semua ffmpeg memakai semua core)
+        self.allocator = cpu_alloc.CoreAllocator(reserve=CPU_RESERVE)
 
-        if not looping or not streaming_active:
-            break
+    def get(self, name):
+        return self.sessions.get(name)
 
-    if os.path.exists("ffmpeg.lock"):
-        os.remove("ffmpeg.lock")
+    def running_sessions(self):
+        return [session for session in self.sessions.values() if session.active]
 
-    if retries > MAX_RETRIES and send_status_message:
-        asyncio.create_task(send_status_message(current_user_id, "🚫 Gagal menjalankan live setelah beberapa percobaan."))
+    def is_running(self, name):
+        session = self.sessions.get(name)
+        return bool(session and session.is_running())
 
-async def stop_streaming():
-    global ffmpeg_process, streaming_active
-    streaming_active = False
-    if ffmpeg_process:
-        print("[INFO] Stopping stream...")
+    def check_capacity(self, config, running):
+        """Cek sisa CPU host sebelum menambah sesi. Raise StreamLimitError jika tidak cukup."""
+        if benchmark.is_running():
+            raise StreamLimitError("Benchmark server sedang berjalan, tunggu sampai selesai.")
+        if self.max_sessions is not None and len(running) >= self.max_sessions:
+            raise StreamLimitError(f"Batas {self.max_sessions} sesi live per host sudah tercapai.")
 
+        cost = estimate_cpu_cost(config)
+        quality = config.get("resolution", "720p60")
+        limit = benchmark.preset_limit(quality)
+        if cost > COPY_CPU_COST and limit is not None:
+            same = [session for session in running if session.quality == quality and session.cpu_cost > COPY_CPU_COST]
+            if limit == 0:
+                raise StreamLimitError(benchmark.preset_warning(quality, config.get("mode")) +
+                                       " Pilih resolusi lebih rendah atau Prepare Video (Cache).")
+            if len(same) >= limit:
+                raise StreamLimitError(f"Hasil benchmark: server hanya kuat {limit} stream {quality} sekaligus.")
+        cpu_count = ffmpeg_caps.usable_cores()
+        # Sesi yang baru start belum tentu sudah memakai CPU penuh, jadi pakai yang lebih kecil
+        # antara sisa CPU terukur dan sisa CPU setelah dikurangi perkiraan sesi yang berjalan
+        measured_free = cpu_count * (1 - psutil.cpu_percent(interval=0.5) / 100)
+        committed_free = cpu_count - sum(session.cpu_cost for session in running)
+        headroom = min(measured_free, committed_free) - CPU_RESERVE
+        if cost > headroom:
+            raise StreamLimitError(
+                f"CPU tidak cukup: butuh ±{cost:.1f} core, sisa ±{max(headroom, 0):.1f} core "
+                f"({len(running)} sesi berjalan)."
+            )
+        return cost
+
+    async def start(self, name, notifier=None, user_id=None):
+        """Mulai sesi sebagai task di event loop.
+
+        Raise StreamLimitError jika sudah berjalan / CPU tidak cukup, CapabilityError jika ffmpeg tidak mendukung tujuan.
+        """
+        existing = self.sessions.get(name)
+        if existing and existing.active:
+            raise StreamLimitError(f"Sesi '{name}' sudah berjalan.")
+
+        running = self.running_sessions()
+        session = StreamSession(name, notifier, user_id, self.allocator, self.logs.setdefault(name, session_log.LogBuffer()))
+        # Daftarkan dulu agar Start ganda selama cek CPU tetap ditolak
+        session.active = True
+        self.sessions[name] = session
         try:
-            if platform.system() == "Windows":
-                ffmpeg_process.terminate()
+            config = load_config(name)
+            # ffmpeg sudah dicek saat startup, di sini cukup pastikan protokol tiap tujuan didukung
+            ffmpeg_caps.check_destinations(get_destinations(config))
+            session.cpu_cost = await asyncio.to_thread(self.check_capacity, config, running)
+        except Exception:
+            session.active = False
+            if existing:
+                self.sessions[name] = existing
             else:
-                ffmpeg_process.send_signal(signal.SIGINT)
+                del self.sessions[name]
+            raise
+        session.task = asyncio.create_task(session.run())
+        return session
+
+    async def stop(self, name):
+        session = self.sessions.get(name)
+        if session:
+            await session.stop()
 
-            ffmpeg_process.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            ffmpeg_process.kill()
+    async def stop_all(self):
+        await asyncio.gather(*(session.stop() for session in list(self.sessions.values())))
 
-        ffmpeg_process = None
+manager = StreamManager()
 
-        if os.path.exists("ffmpeg.lock"):
-            os.remove("ffmpeg.lock")
+async def start_streaming(session_name=DEFAULT_SESSION):
+    session = await manager.start(session_name)
+    await session.task
 
-        print("[INFO] Stream stopped.")
-        if send_status_message:
-            await send_status_message(current_user_id, "🛑 Live streaming dihentikan.")
+async def stop_streaming(session_name=DEFAULT_SESSION):
+    await manager.stop(session_name)
 
-async def schedule_stop(delay_seconds):
-    print(f"[INFO] Scheduling stop in {delay_seconds} seconds...")
-    await asyncio.sleep(delay_seconds)
-    await stop_streaming()
+def prewarm(session_name):
+    """Persiapan Start lebih awal untuk live terjadwal: cek ffmpeg & tujuan, probe video, cek cache
+    (item pertama playlist langsung disiapkan). Return keterangan jalur encode. Raise jika config bermasalah."""
+    config = load_config(session_name)
+    ffmpeg_path = find_ffmpeg()
+    ffmpeg_caps.check_destinations(get_destinations(config))
+    quality = config.get("resolution", "720p60")
+    mode = config.get("mode", "landscape")
+    playlist = get_playlist(config) if config.get("playlist_enabled") else []
+    if playlist:
+        if config.get("shuffle"):
+            # Item pertama baru dipilih saat Start, cukup hash & cek cache semua item
+            for path in playlist:
+                transcode_cache.lookup(path, quality, mode, "mpegts")
+        else:
+            max_bytes = int(float(config.get("cache_max_gb", transcode_cache.DEFAULT_CACHE_MAX_GB)) * 1024 ** 3)
+            transcode_cache.prepare_video(playlist[0], quality, mode, ffmpeg_path, max_bytes, "mpegts", manager.allocator)
+        return format_encode_path("playlist")
+    if not config.get("video_path") or not os.path.exists(config["video_path"]):
+        raise FileNotFoundError(f"[ERROR] File video tidak ditemukan: {config.get('video_path')}")
+    return describe_encode_path(config)
 
-def is_streaming():
-    """Cek apakah proses FFmpeg sedang berjalan di sistem."""
-    for proc in psutil.process_iter(['name']):
-        if proc.info['name'] and 'ffmpeg' in proc.info['name'].lower():
-            return True
-    return False
+def is_streaming(session_name=None):
+    """Cek apakah encoder sesi (atau sesi mana pun) sedang berjalan, dari sesi di memori & record PID."""
+    if session_name is not None:
+        return manager.is_running(session_name) or runtime_state.session_alive(session_name)
+    state = runtime_state.load_state()
+    return any(manager.is_running(name) or runtime_state.session_alive(name, state)
+               for name in set(manager.sessions) | set(state["sessions"]))
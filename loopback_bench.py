@@ -0,0 +1,285 @@
+import os, sys, json, time, socket, asyncio, argparse, platform, tempfile, subprocess, shutil
+import livestream
+import ffmpeg_caps
+from proc_utils import terminate_process
+
+# Harness lokal: sesi live dijalankan seperti biasa tetapi tujuannya RTMP di 127.0.0.1, tanpa
+# stream key asli. Hasil pengukuran disimpan sebagai laporan JSON yang bisa dibandingkan antar rilis.
+
+REPORT_FILE = 'loopback_report.json'
+SESSION_NAME = 'loopback'
+STREAM_PATH = 'live'
+STREAM_KEY = 'loopback'
+# Byte awal koneksi yang masih berupa handshake / perintah RTMP, sesudahnya dianggap data video
+HANDSHAKE_BYTES = 8192
+WAIT_TIMEOUT = 120
+# Ditandai REGRESI jika lebih buruk > REGRESSION_PERCENT % dan selisihnya >= REGRESSION_MIN
+REGRESSION_PERCENT = 10
+REGRESSION_MIN = 0.2
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class Receiver:
+    """Penerima RTMP lokal: ffmpeg -listen di belakang proxy TCP yang mencatat waktu & jumlah byte.
+
+    kill() memutus semua koneksi & mematikan listener (simulasi server RTMP down), restore()
+    menerima koneksi lagi. Setiap koneksi baru dilayani listener ffmpeg baru.
+    """
+
+    def __init__(self, ffmpeg_path):
+        self.ffmpeg_path = ffmpeg_path
+        self.port = None
+        self.online = True
+        self.server = None
+        self.listener = None
+        self.writers = set()
+        self.bytes = 0
+        self.media_started = []
+        self.last_byte_at = None
+        self.max_gap = 0
+        self.closed_at = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return f"rtmp://127.0.0.1:{self.port}/{STREAM_PATH}"
+
+    async def start_listener(self):
+        await terminate_process(self.listener)
+        port = free_port()
+        self.listener = await asyncio.create_subprocess_exec(
+            self.ffmpeg_path, "-hide_banner", "-loglevel", "error",
+            "-listen", "1", "-f", "flv", "-i", f"rtmp://127.0.0.1:{port}/{STREAM_PATH}/{STREAM_KEY}",
+            "-c", "copy", "-f", "null", "-",
+            stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL
+        )
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            try:
+                return await asyncio.open_connection("127.0.0.1", port)
+            except OSError:
+                await asyncio.sleep(0.05)
+        raise RuntimeError("[ERROR] Listener RTMP lokal tidak bisa dihubungi.")
+
+    async def forward(self, reader, writer, count):
+        received = 0
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                if count:
+                    now = time.time()
+                    if received < HANDSHAKE_BYTES <= received + len(data):
+                        self.media_started.append(now)
+                    if self.last_byte_at and received >= HANDSHAKE_BYTES:
+                        self.max_gap = max(self.max_gap, now - self.last_byte_at)
+                    received += len(data)
+                    self.bytes += len(data)
+                    self.last_byte_at = now
+                writer.write(data)
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+            if count:
+                self.closed_at = time.time()
+
+    async def handle(self, reader, writer):
+        if not self.online:
+            writer.close()
+            return
+        try:
+            upstream_reader, upstream_writer = await self.start_listener()
+        except RuntimeError as e:
+            print(str(e))
+            writer.close()
+            return
+        self.writers.update((writer, upstream_writer))
+        await asyncio.gather(
+            self.forward(reader, upstream_writer, True),
+            self.forward(upstream_reader, writer, False),
+        )
+        self.writers.difference_update((writer, upstream_writer))
+
+    async def wait_media(self, after, timeout=WAIT_TIMEOUT):
+        """Tunggu data video pertama yang datang setelah waktu `after`. Return waktunya."""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            started = [t for t in self.media_started if t >= after]
+            if started:
+                return started[0]
+            await asyncio.sleep(0.05)
+        raise TimeoutError(f"Tidak ada data video dalam {timeout} detik.")
+
+    async def kill(self):
+        self.online = False
+        for writer in list(self.writers):
+            writer.close()
+        await terminate_process(self.listener)
+
+    def restore(self):
+        self.online = True
+
+    async def stop(self):
+        await self.kill()
+        self.server.close()
+        await self.server.wait_closed()
+
+def make_test_clip(ffmpeg_path, path, seconds=20):
+    """Klip uji H.264/AAC sintetis (testsrc2 + sine) untuk sumber live."""
+    preset = livestream.YOUTUBE_PRESET["720p60"]
+    cmd = [
+        ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={preset['resolution']}:rate={preset['fps']}:duration={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={seconds}",
+        "-map", "0:v", "-map", "1:a",
+    ] + livestream.build_encode_args(preset, preset["resolution"]) + [path]
+    subprocess.run(cmd, check=True)
+    return path
+
+async def run_harness(duration, down_seconds, video_path=None, resolution="720p60"):
+    """Jalankan satu putaran pengukuran. Return dict hasil (detik / kbps)."""
+    caps = ffmpeg_caps.get_capabilities()
+    receiver = Receiver(caps["ffmpeg"])
+    rtmp_url = await receiver.start()
+    if not video_path:
+        video_path = await asyncio.to_thread(make_test_clip, caps["ffmpeg"], os.path.abspath("loopback_clip.mp4"))
+
+    with open(livestream.CONFIG_FILE, "w") as f:
+        json.dump({"sessions": {SESSION_NAME: {
+            "rtmp_url": rtmp_url, "stream_key": STREAM_KEY, "video_path": video_path,
+            "resolution": resolution, "mode": "landscape", "looping": True,
+        }}}, f, indent=2)
+
+    messages = []
+    async def notifier(user_id, message):
+        messages.append(message)
+
+    results = {}
+    try:
+        # 1. Waktu dari Start sampai data video pertama sampai di server RTMP
+        started = time.time()
+        session = await livestream.manager.start(SESSION_NAME, notifier)
+        first_media = await receiver.wait_media(started)
+        results["time_to_first_packet"] = first_media - started
+        print(f"[INFO] Loopback: data pertama {results['time_to_first_packet']:.2f}s setelah Start")
+
+        # 2. Throughput stabil selama `duration` detik
+        bytes_before, measure_start = receiver.bytes, time.time()
+        receiver.max_gap = 0
+        await asyncio.sleep(duration)
+        elapsed = time.time() - measure_start
+        results["throughput_kbps"] = (receiver.bytes - bytes_before) * 8 / 1000 / elapsed
+        results["max_stall"] = receiver.max_gap
+        results["encoder_speed"] = session.metrics.get("speed")
+        results["encoder_cpu_percent"] = session.metrics.get("cpu_percent")
+        print(f"[INFO] Loopback: throughput {results['throughput_kbps']:.0f} kbps, jeda terlama {results['max_stall']:.2f}s")
+
+        # 3. Server RTMP dimatikan sengaja lalu dihidupkan lagi
+        restarts_before = session.restarts
+        killed = time.time()
+        await receiver.kill()
+        await asyncio.sleep(down_seconds)
+        restored = time.time()
+        receiver.restore()
+        resumed = await receiver.wait_media(restored)
+        results["reconnect_gap"] = resumed - restored
+        results["outage"] = resumed - killed
+        results["encoder_restarts"] = session.restarts - restarts_before
+        print(f"[INFO] Loopback: tersambung lagi {results['reconnect_gap']:.2f}s setelah server hidup "
+              f"(encoder restart {results['encoder_restarts']}x)")
+
+        # 4. Lama Stop (SIGINT, tunggu, kill) sampai koneksi RTMP tertutup
+        receiver.closed_at = None
+        stop_started = time.time()
+        await livestream.manager.stop(SESSION_NAME)
+        results["stop_latency"] = time.time() - stop_started
+        results["stop_disconnect"] = (receiver.closed_at - stop_started) if receiver.closed_at else None
+        print(f"[INFO] Loopback: Stop selesai dalam {results['stop_latency']:.2f}s")
+    finally:
+        await livestream.manager.stop_all()
+        await receiver.stop()
+    results["notifications"] = messages
+    return results
+
+METRICS = [
+    # (key, label, lebih kecil lebih baik)
+    ("time_to_first_packet", "Start -> data pertama (s)", True),
+    ("stop_latency", "Lama Stop (s)", True),
+    ("stop_disconnect", "Stop -> koneksi RTMP tutup (s)", True),
+    ("reconnect_gap", "Server hidup -> data lagi (s)", True),
+    ("outage", "Total putus (s)", True),
+    ("encoder_restarts", "Encoder restart saat putus", True),
+    ("throughput_kbps", "Throughput (kbps)", False),
+    ("max_stall", "Jeda data terlama (s)", True),
+]
+
+def format_report(report, baseline=None):
+    lines = [
+        f"Loopback RTMP benchmark {time.strftime('%Y-%m-%d %H:%M', time.localtime(report['created']))} "
+        f"({report['host']}, ffmpeg {report['ffmpeg_version']}, {report['resolution']}, {report['duration']}s)",
+    ]
+    for key, label, lower_is_better in METRICS:
+        value = report["results"].get(key)
+        line = f"- {label}: {value:.2f}" if value is not None else f"- {label}: -"
+        old = baseline["results"].get(key) if baseline else None
+        if value is not None and old:
+            change = (value - old) / old * 100
+            worse = (change > REGRESSION_PERCENT if lower_is_better else change < -REGRESSION_PERCENT) \
+                and abs(value - old) >= REGRESSION_MIN
+            line += f" (sebelumnya {old:.2f}, {change:+.0f}%{' REGRESI' if worse else ''})"
+        lines.append(line)
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark live streaming ke server RTMP lokal (tanpa stream key asli).")
+    parser.add_argument("--duration", type=int, default=60, help="lama pengukuran throughput (detik)")
+    parser.add_argument("--down", type=int, default=5, help="lama server RTMP dimatikan (detik)")
+    parser.add_argument("--video", help="video sumber (default: klip uji sintetis)")
+    parser.add_argument("--resolution", default="720p60", choices=list(livestream.YOUTUBE_PRESET))
+    parser.add_argument("--output", default=REPORT_FILE, help="file laporan JSON")
+    parser.add_argument("--compare", help="laporan lama untuk dibandingkan")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+    video = os.path.abspath(args.video) if args.video else None
+
+    # Semua file kerja (streaming.json, cache, lock) di folder sementara agar konfigurasi asli aman
+    original_dir = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="loopback_")
+    os.chdir(workdir)
+    try:
+        results = asyncio.run(run_harness(args.duration, args.down, video, args.resolution))
+    except (ffmpeg_caps.CapabilityError, livestream.StreamLimitError, TimeoutError, RuntimeError) as e:
+        print(f"[ERROR] Loopback benchmark gagal: {e}")
+        sys.exit(1)
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "created": time.time(),
+        "host": socket.gethostname(),
+        "python": platform.python_version(),
+        "ffmpeg_version": ffmpeg_caps.get_capabilities()["version"],
+        "resolution": args.resolution,
+        "duration": args.duration,
+        "down": args.down,
+        "results": results,
+    }
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(format_report(report, baseline))
+    print(f"[INFO] Laporan disimpan: {output}")
+
+if __name__ == "__main__":
+    main()
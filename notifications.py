@@ -0,0 +1,71 @@
+import time, asyncio
+
+# Jarak minimum antar pesan notifikasi ke satu chat (detik)
+NOTIFY_INTERVAL = 3
+# Tunggu sebentar agar notifikasi yang datang beruntun masuk satu pesan
+BATCH_DELAY = 1
+# Notifikasi yang ditahan per chat; jika lebih, yang terlama dibuang
+MAX_PENDING = 30
+MAX_MESSAGE_LENGTH = 4000
+
+class Notifier:
+    """Antrian notifikasi ke Telegram: digabung per chat, pesan yang sama dihitung sekali (xN),
+    dan maksimal satu pesan tiap NOTIFY_INTERVAL detik sehingga badai reconnect tidak kena rate limit.
+
+    `send` adalah coroutine send(user_id, text). push() aman dipanggil berkali-kali dari event loop.
+    """
+
+    def __init__(self, send, interval=NOTIFY_INTERVAL):
+        self.send = send
+        self.interval = interval
+        self.pending = {}
+        self.dropped = {}
+        self.last_sent = {}
+        self.tasks = {}
+
+    def push(self, user_id, message):
+        pending = self.pending.setdefault(user_id, {})
+        if message in pending:
+            pending[message] += 1
+        else:
+            if len(pending) >= MAX_PENDING:
+                pending.pop(next(iter(pending)))
+                self.dropped[user_id] = self.dropped.get(user_id, 0) + 1
+            pending[message] = 1
+        if user_id not in self.tasks:
+            self.tasks[user_id] = asyncio.create_task(self._flush_later(user_id))
+
+    async def _flush_later(self, user_id):
+        wait = self.last_sent.get(user_id, 0) + self.interval - time.time()
+        await asyncio.sleep(max(wait, BATCH_DELAY))
+        # Dilepas sebelum mengirim: notifikasi yang datang selama kirim masuk batch berikutnya
+        self.tasks.pop(user_id, None)
+        await self.flush(user_id)
+
+    def format_batch(self, pending, dropped):
+        lines = [f"{message} (x{count})" if count > 1 else message for message, count in pending.items()]
+        if dropped:
+            lines.insert(0, f"… {dropped} notifikasi lama dilewati")
+        text = "\n".join(lines)
+        if len(text) > MAX_MESSAGE_LENGTH:
+            text = "…" + text[-MAX_MESSAGE_LENGTH:]
+        return text
+
+    async def flush(self, user_id):
+        pending = self.pending.pop(user_id, None)
+        dropped = self.dropped.pop(user_id, 0)
+        if not pending:
+            return
+        self.last_sent[user_id] = time.time()
+        try:
+            await self.send(user_id, self.format_batch(pending, dropped))
+        except Exception as e:
+            print(f"[ERROR] Gagal kirim notifikasi: {e}")
+
+    async def flush_all(self):
+        """Kirim semua notifikasi yang tertahan sekarang (dipakai saat bot berhenti)."""
+        for task in list(self.tasks.values()):
+            task.cancel()
+        self.tasks.clear()
+        for user_id in list(self.pending):
+            await self.flush(user_id)
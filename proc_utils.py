@@ -0,0 +1,67 @@
+import asyncio, signal, platform, random, time
+from collections import deque
+
+async def read_lines(stream, chunk_size=4096):
+    """Baca output proses per baris tanpa blocking. ffmpeg memakai '\r' untuk baris statistik,
+    jadi '\r' juga dianggap akhir baris (readline() biasa bisa menumpuk buffer tanpa batas)."""
+    buffer = b""
+    while True:
+        chunk = await stream.read(chunk_size)
+        if not chunk:
+            break
+        buffer += chunk
+        parts = buffer.replace(b"\r", b"\n").split(b"\n")
+        buffer = parts.pop()
+        for part in parts:
+            if part.strip():
+                yield part.decode(errors="ignore").strip()
+    if buffer.strip():
+        yield buffer.decode(errors="ignore").strip()
+
+async def terminate_process(process, timeout=5):
+    """Hentikan proses ffmpeg dengan SIGINT (terminate di Windows), kill jika tidak berhenti."""
+    if process is None or process.returncode is not None:
+        return
+    try:
+        if platform.system() == "Windows":
+            process.terminate()
+        else:
+            process.send_signal(signal.SIGINT)
+        await asyncio.wait_for(process.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+    except ProcessLookupError:
+        pass
+
+def backoff_delay(attempt, base=3, maximum=60):
+    """Exponential backoff dengan jitter: base * 2^(attempt-1), maks `maximum`, diacak 50-100%
+    agar beberapa stream yang putus bersamaan tidak reconnect di detik yang sama."""
+    delay = min(base * 2 ** max(attempt - 1, 0), maximum)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class RetryWindow:
+    """Hitung kegagalan dalam jendela waktu (bukan sepanjang umur stream)."""
+
+    def __init__(self, max_failures, window_seconds):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.failures = deque()
+
+    def _trim(self, now):
+        while self.failures and now - self.failures[0] > self.window_seconds:
+            self.failures.popleft()
+
+    def record(self, now=None):
+        """Catat satu kegagalan. Return jumlah kegagalan dalam jendela."""
+        now = now or time.time()
+        self.failures.append(now)
+        self._trim(now)
+        return len(self.failures)
+
+    def count(self, now=None):
+        self._trim(now or time.time())
+        return len(self.failures)
+
+    def exceeded(self, now=None):
+        return self.count(now) > self.max_failures
@@ -0,0 +1,224 @@
+import sys, asyncio, socket, time
+from collections import deque
+import cpu_alloc
+import runtime_state
+import session_log
+from proc_utils import read_lines, terminate_process, backoff_delay, RetryWindow
+
+# Pusher dianggap stabil (backoff direset) jika sudah tersambung selama ini (detik)
+RELAY_STABLE_SECONDS = 30
+# Lewat RELAY_MAX_FAILURES kali gagal dalam RELAY_RETRY_WINDOW detik, tujuan ditandai GAGAL dan
+# admin diberi tahu, tapi reconnect tetap dicoba tiap RELAY_BACKOFF_MAX detik (mis. YouTube down lama)
+RELAY_MAX_FAILURES = 10
+RELAY_RETRY_WINDOW = 600
+RELAY_BACKOFF_MAX = 60
+# Besar buffer per tujuan dalam detik (dihitung dari maxrate preset)
+RELAY_BUFFER_SECONDS = 20
+SOCKET_RCVBUF = 4 * 1024 * 1024
+# Datagram di buffer digabung jadi satu write ke pusher (bukan write + drain per paket 1316 byte)
+PUMP_BATCH_BYTES = 256 * 1024
+# Buffer socket UDP harus muat data selama event loop sibuk sejenak; jika lebih kecil, paket hilang diam-diam
+SOCKET_BURST_SECONDS = 2
+
+def build_pusher_command(ffmpeg_path, url):
+    return [
+        ffmpeg_path, "-hide_banner", "-nostats",
+        "-f", "mpegts", "-i", "pipe:0",
+        "-c", "copy", "-f", "flv", url
+    ]
+
+class Relay(asyncio.DatagramProtocol):
+    """Satu tujuan RTMP yang dipisah dari encoder.
+
+    Encoder mengirim MPEG-TS ke port UDP lokal milik relay. Data ditampung di buffer memori
+    terbatas lalu diteruskan ke proses pusher (ffmpeg -c copy ke RTMP). Jika koneksi RTMP
+    putus, encoder tetap berjalan; pusher dijalankan ulang dengan backoff dan isi buffer
+    dikirim ulang sehingga jeda yang terlihat penonton lebih pendek.
+    """
+
+    def __init__(self, session_name, dest, ffmpeg_path, max_buffer_bytes, notify=None, allocation=None, log=None):
+        self.session_name = session_name
+        self.name = dest["name"]
+        self.url = dest["url"]
+        self.ffmpeg_path = ffmpeg_path
+        self.max_buffer_bytes = max_buffer_bytes
+        self.notify = notify
+        self.allocation = allocation
+        self.log = log or session_log.LogBuffer()
+        self.buffer = deque()
+        self.buffer_bytes = 0
+        self.dropped_bytes = 0
+        self.status = {"state": "STARTING", "retries": 0, "last_error": "", "buffered": 0, "dropped": 0}
+        self.failures = RetryWindow(RELAY_MAX_FAILURES, RELAY_RETRY_WINDOW)
+        self.active = False
+        self.process = None
+        self.transport = None
+        self.task = None
+        self.port = None
+        self._restart_requested = False
+        self._data_event = asyncio.Event()
+        self._stop_event = asyncio.Event()
+
+    def datagram_received(self, data, addr):
+        self.buffer.append(data)
+        self.buffer_bytes += len(data)
+        # Buffer penuh: buang data paling lama (paket TS 188 byte tetap utuh per datagram)
+        while self.buffer_bytes > self.max_buffer_bytes and self.buffer:
+            dropped = self.buffer.popleft()
+            self.buffer_bytes -= len(dropped)
+            self.dropped_bytes += len(dropped)
+        self._data_event.set()
+
+    async def start(self):
+        """Buka port UDP lokal & mulai supervisor pusher. Return port untuk output encoder."""
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        burst = self.max_buffer_bytes // RELAY_BUFFER_SECONDS * SOCKET_BURST_SECONDS
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, max(SOCKET_RCVBUF, burst))
+        self.check_rcvbuf(sock, burst)
+        sock.bind(("127.0.0.1", 0))
+        self.transport, _ = await loop.create_datagram_endpoint(lambda: self, sock=sock)
+        self.port = sock.getsockname()[1]
+        self.active = True
+        self.task = asyncio.create_task(self.supervise())
+        return self.port
+
+    def check_rcvbuf(self, sock, burst):
+        """Kernel diam-diam membatasi SO_RCVBUF (Linux: net.core.rmem_max), jadi dibaca ulang."""
+        actual = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+        if sys.platform.startswith("linux"):
+            # Linux melaporkan dua kali nilai yang dipakai (termasuk overhead kernel)
+            actual //= 2
+        if actual < burst:
+            print(f"[WARN] [{self.session_name}] Buffer UDP relay {self.name} hanya {actual // 1024} KB, "
+                  f"butuh ±{burst // 1024} KB: paket bisa hilang saat bot sibuk. "
+                  f"Naikkan dengan: sysctl -w net.core.rmem_max={max(SOCKET_RCVBUF, burst)}")
+        return actual
+
+    def clear_buffer(self):
+        self.buffer.clear()
+        self.buffer_bytes = 0
+
+    async def restart(self, clear_buffer=False):
+        """Sambung ulang pusher tanpa dihitung gagal (mis. setelah encoder ganti preset)."""
+        if clear_buffer:
+            self.clear_buffer()
+        self._restart_requested = True
+        await terminate_process(self.process)
+
+    async def pump(self, process):
+        """Teruskan isi buffer ke stdin pusher. Data yang gagal dikirim dikembalikan ke buffer."""
+        while True:
+            await self._data_event.wait()
+            self._data_event.clear()
+            while self.buffer:
+                chunks = []
+                size = 0
+                while self.buffer and size < PUMP_BATCH_BYTES:
+                    chunk = self.buffer.popleft()
+                    chunks.append(chunk)
+                    size += len(chunk)
+                self.buffer_bytes -= size
+                try:
+                    process.stdin.write(b"".join(chunks))
+                    await process.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    self.buffer.extendleft(reversed(chunks))
+                    self.buffer_bytes += size
+                    return
+
+    async def wait_or_stop(self, delay):
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def supervise(self):
+        """Jaga pusher: jika putus, hanya tujuan ini yang reconnect (encoder tidak di-restart).
+
+        Tidak pernah menyerah selama sesi aktif: setelah batas gagal terlewati, reconnect tetap dicoba
+        dengan jeda maksimum sampai tujuan kembali atau sesi di-Stop.
+        """
+        attempt = 0
+        degraded = False
+        while self.active:
+            started = time.time()
+            try:
+                self.process = await asyncio.create_subprocess_exec(
+                    *build_pusher_command(self.ffmpeg_path, self.url),
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                cpu_alloc.apply(self.process.pid, self.allocation)
+                runtime_state.record_process(self.session_name, f"relay/{self.name}", self.process.pid)
+            except Exception as e:
+                self.status.update(state="ERROR", last_error=str(e))
+                print(f"[ERROR] [{self.session_name}] Gagal menjalankan relay {self.name}: {e}")
+                self.process = None
+                await self.wait_or_stop(RELAY_BACKOFF_MAX)
+                continue
+            if not self.active:
+                # stop() dipanggil saat pusher sedang dijalankan
+                await terminate_process(self.process)
+                self.process = None
+                break
+            self.status["state"] = "ONLINE"
+            print(f"[INFO] [{self.session_name}] Relay {self.name} started (buffer {self.buffer_bytes // 1024} KB).")
+            self._data_event.set()
+            pump_task = asyncio.create_task(self.pump(self.process))
+
+            last_line = ""
+            async for line in read_lines(self.process.stderr):
+                last_line = line
+                if self.log.add(f"relay/{self.name}", line):
+                    print(f"[RELAY {self.session_name}/{self.name}]", line)
+            returncode = await self.process.wait()
+            pump_task.cancel()
+            await asyncio.gather(pump_task, return_exceptions=True)
+            self.process = None
+            if not self.active:
+                break
+            if self._restart_requested:
+                self._restart_requested = False
+                continue
+
+            if time.time() - started >= RELAY_STABLE_SECONDS:
+                # Sempat stabil: gangguan berikutnya dihitung dari awal (dan diberitahukan lagi)
+                attempt = 0
+                degraded = False
+            attempt += 1
+            failures = self.failures.record()
+            self.status.update(state="RECONNECT", retries=self.status["retries"] + 1, last_error=last_line)
+            if self.failures.exceeded():
+                # Tetap dicoba dengan jeda maksimum; admin cukup diberi tahu sekali
+                self.status["state"] = "GAGAL"
+                delay = RELAY_BACKOFF_MAX
+                if not degraded:
+                    degraded = True
+                    print(f"[ERROR] [{self.session_name}] Relay {self.name} gagal {failures}x dalam {RELAY_RETRY_WINDOW}s, "
+                          f"dicoba ulang tiap {RELAY_BACKOFF_MAX}s.")
+                    if self.notify:
+                        self.notify(f"⚠️ Tujuan {self.name} gagal {failures}x dalam {RELAY_RETRY_WINDOW // 60} menit, "
+                                    f"tetap dicoba ulang tiap {RELAY_BACKOFF_MAX} detik.")
+            else:
+                delay = backoff_delay(attempt, maximum=RELAY_BACKOFF_MAX)
+            print(f"[WARN] [{self.session_name}] Relay {self.name} exited with code {returncode}, "
+                  f"reconnect dalam {delay:.1f}s ({failures}/{RELAY_MAX_FAILURES} dalam {RELAY_RETRY_WINDOW}s)")
+            await self.wait_or_stop(delay)
+
+        self.status["state"] = "OFFLINE"
+
+    def snapshot(self):
+        """Status terbaru termasuk isi buffer, untuk Cek Status Live."""
+        self.status.update(buffered=self.buffer_bytes, dropped=self.dropped_bytes)
+        return self.status
+
+    async def stop(self):
+        self.active = False
+        self._stop_event.set()
+        await terminate_process(self.process)
+        if self.transport:
+            self.transport.close()
+        if self.task:
+            await asyncio.gather(self.task, return_exceptions=True)
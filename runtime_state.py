@@ -0,0 +1,118 @@
+import os, json, time, threading
+import psutil
+
+# Proses ffmpeg yang sedang dijalankan bot (per sesi), pengganti file ffmpeg_<sesi>.lock
+RUNTIME_FILE = 'runtime.json'
+REAP_TIMEOUT = 5
+
+_lock = threading.Lock()
+
+def load_state():
+    if not os.path.exists(RUNTIME_FILE):
+        return {"sessions": {}}
+    try:
+        with open(RUNTIME_FILE, 'r') as f:
+            state = json.load(f)
+    except ValueError:
+        return {"sessions": {}}
+    state.setdefault("sessions", {})
+    return state
+
+def save_state(state):
+    tmp_path = RUNTIME_FILE + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, RUNTIME_FILE)
+
+def start_session(name, session_id, user_id=None):
+    with _lock:
+        state = load_state()
+        state["sessions"][name] = {
+            "session_id": session_id,
+            "user_id": user_id,
+            "bot_pid": os.getpid(),
+            "bot_create_time": psutil.Process().create_time(),
+            "started": time.time(),
+            "processes": {},
+        }
+        save_state(state)
+
+def record_process(name, role, pid):
+    """Catat PID & waktu start proses (role: 'encoder' atau 'relay/<tujuan>') untuk sesi `name`."""
+    try:
+        create_time = psutil.Process(pid).create_time()
+    except psutil.Error:
+        return
+    with _lock:
+        state = load_state()
+        session = state["sessions"].get(name)
+        if session is None:
+            return
+        session["processes"][role] = {"pid": pid, "create_time": create_time}
+        save_state(state)
+
+def end_session(name):
+    with _lock:
+        state = load_state()
+        if state["sessions"].pop(name, None) is not None:
+            save_state(state)
+
+def get_process(record):
+    """psutil.Process untuk record jika masih hidup & benar proses yang sama (bukan PID yang dipakai ulang)."""
+    try:
+        process = psutil.Process(record["pid"])
+        if abs(process.create_time() - record["create_time"]) > 0.01:
+            return None
+        return process if process.is_running() and process.status() != psutil.STATUS_ZOMBIE else None
+    except psutil.Error:
+        return None
+
+def bot_alive(session):
+    return bool(session.get("bot_create_time") and
+                get_process({"pid": session["bot_pid"], "create_time": session["bot_create_time"]}))
+
+def session_alive(name, state=None):
+    """Cek encoder sesi dari record PID (O(1), tanpa scan semua proses di host)."""
+    state = state or load_state()
+    session = state["sessions"].get(name)
+    encoder = session["processes"].get("encoder") if session else None
+    return bool(encoder and get_process(encoder))
+
+def reap_orphans():
+    """Hentikan proses ffmpeg sisa bot sebelumnya (bot crash / di-kill) lalu hapus record-nya.
+
+    Return daftar sesi yang sedang live saat bot berhenti, beserta user_id, untuk dilanjutkan.
+    """
+    with _lock:
+        state = load_state()
+        # Sesi milik bot yang masih hidup (proses ini atau instance lain) tidak disentuh
+        sessions = {
+            name: s for name, s in state["sessions"].items()
+            if s.get("bot_pid") != os.getpid() and not bot_alive(s)
+        }
+        for name in sessions:
+            del state["sessions"][name]
+        save_state(state)
+
+    orphans = []
+    interrupted = []
+    for name, session in sessions.items():
+        for role, record in session["processes"].items():
+            process = get_process(record)
+            if process:
+                print(f"[WARN] [{name}] Menghentikan ffmpeg sisa ({role}, PID {record['pid']})")
+                orphans.append(process)
+        interrupted.append({"name": name, "user_id": session.get("user_id")})
+
+    for process in orphans:
+        try:
+            process.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(orphans, timeout=REAP_TIMEOUT)
+    for process in alive:
+        try:
+            process.kill()
+        except psutil.Error:
+            pass
+    return interrupted
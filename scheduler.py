@@ -0,0 +1,167 @@
+import os, json, time, heapq, uuid, asyncio, datetime
+
+# Jadwal disimpan agar tetap berjalan setelah bot restart
+SCHEDULE_FILE = 'schedule.json'
+ACTIONS = {
+    "start": "▶️ Start",
+    "stop": "⏹ Stop",
+    "preset": "🎚 Ganti resolusi",
+    "playlist": "📃 Mode playlist",
+}
+# Persiapan (probe video, cek cache) dikerjakan sekian detik sebelum jadwal Start
+PREWARM_SECONDS = 300
+# Jadwal Start yang terlewat saat bot mati tetap dijalankan jika terlambat kurang dari ini (detik)
+MISSED_GRACE = 900
+# Timer dibangunkan paling lama tiap MAX_SLEEP detik agar perubahan jam sistem tetap terdeteksi
+MAX_SLEEP = 60
+
+def parse_time(text, now=None):
+    """'30' = 30 menit lagi, '21:00' = jam 21:00 berikutnya (hari ini atau besok). Return timestamp.
+
+    Raise ValueError jika format salah.
+    """
+    now = now or time.time()
+    text = text.strip()
+    if text.isdigit():
+        return now + int(text) * 60
+    hour, minute = (int(part) for part in text.split(":"))
+    current = datetime.datetime.fromtimestamp(now)
+    target = current.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= current:
+        target += datetime.timedelta(days=1)
+    return target.timestamp()
+
+def format_time(timestamp):
+    moment = datetime.datetime.fromtimestamp(timestamp)
+    same_day = moment.date() == datetime.date.today()
+    return moment.strftime("%H:%M" if same_day else "%d/%m %H:%M")
+
+def describe(job):
+    text = f"{ACTIONS.get(job['action'], job['action'])} {job['session']}"
+    if job["action"] == "preset":
+        text += f" → {job['value']}"
+    elif job["action"] == "playlist":
+        text += f" {'ON' if job['value'] else 'OFF'}"
+    return text
+
+class Scheduler:
+    """Jadwal start / stop / ganti preset / mode playlist untuk banyak sesi.
+
+    Semua jadwal ada di satu heap (waktu, urutan, id, jenis) dan hanya ada satu timer di event loop
+    untuk entry paling awal. Jadwal yang dibatalkan dibuang saat muncul di puncak heap.
+    `run(job)` dan `prewarm(job)` adalah coroutine yang dijalankan saat waktunya tiba.
+    """
+
+    def __init__(self, run, prewarm=None, path=SCHEDULE_FILE):
+        self.run = run
+        self.prewarm = prewarm
+        self.path = path
+        self.jobs = {}
+        self.heap = []
+        self._seq = 0
+        self._timer = None
+
+    def load(self, now=None):
+        """Pulihkan jadwal dari file. Return daftar jadwal Start yang terlewat terlalu lama (dibuang)."""
+        now = now or time.time()
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r') as f:
+                jobs = json.load(f).get("jobs", [])
+        except ValueError:
+            print(f"[WARN] {self.path} rusak, jadwal diabaikan.")
+            return []
+        expired = []
+        for job in jobs:
+            if job["action"] == "start" and job["run_at"] < now - MISSED_GRACE:
+                expired.append(job)
+                continue
+            self._add(job)
+        if expired:
+            self.save()
+        self._reschedule()
+        return expired
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({"jobs": self.list()}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def _push(self, when, job_id, kind):
+        self._seq += 1
+        heapq.heappush(self.heap, (when, self._seq, job_id, kind))
+
+    def _add(self, job):
+        self.jobs[job["id"]] = job
+        self._push(job["run_at"], job["id"], "run")
+        if job["action"] == "start" and self.prewarm:
+            self._push(max(job["run_at"] - PREWARM_SECONDS, time.time()), job["id"], "prewarm")
+
+    def add(self, session, action, run_at, user_id=None, value=None):
+        if action not in ACTIONS:
+            raise ValueError(f"Aksi jadwal tidak dikenal: {action}")
+        job = {
+            "id": uuid.uuid4().hex[:6],
+            "session": session,
+            "action": action,
+            "value": value,
+            "run_at": run_at,
+            "user_id": user_id,
+            "created": time.time(),
+        }
+        self._add(job)
+        self.save()
+        self._reschedule()
+        return job
+
+    def cancel(self, job_id):
+        """Batalkan jadwal. Return job yang dibatalkan atau None."""
+        job = self.jobs.pop(job_id, None)
+        if job:
+            self.save()
+            self._reschedule()
+        return job
+
+    def list(self, session=None):
+        return sorted(
+            (job for job in self.jobs.values() if session is None or job["session"] == session),
+            key=lambda job: job["run_at"]
+        )
+
+    def _reschedule(self):
+        # Entry yang sudah dibatalkan tidak perlu ditunggu
+        while self.heap and self.heap[0][2] not in self.jobs:
+            heapq.heappop(self.heap)
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        if self.heap:
+            delay = min(max(self.heap[0][0] - time.time(), 0), MAX_SLEEP)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._wake)
+
+    def _wake(self):
+        self._timer = None
+        now = time.time()
+        changed = False
+        while self.heap and self.heap[0][0] <= now:
+            _, _, job_id, kind = heapq.heappop(self.heap)
+            job = self.jobs.get(job_id)
+            if job is None:
+                continue
+            if kind == "prewarm":
+                asyncio.create_task(self.prewarm(job))
+                continue
+            del self.jobs[job_id]
+            changed = True
+            print(f"[INFO] [{job['session']}] Jadwal: {describe(job)}")
+            asyncio.create_task(self.run(job))
+        if changed:
+            self.save()
+        self._reschedule()
+
+    def stop(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
@@ -0,0 +1,81 @@
+import re, time
+from collections import deque
+
+# Baris output ffmpeg terakhir yang disimpan per sesi (encoder + relay), sisanya dibuang
+LOG_LINES = 500
+LEVELS = ("info", "warning", "error")
+# Hanya baris dengan level ini ke atas yang ikut dicetak ke stdout
+ECHO_LEVEL = "warning"
+MAX_LINE_LENGTH = 300
+
+ERROR_PATTERN = re.compile(
+    r"error|failed|invalid|refused|broken pipe|timed out|cannot|could not|unable|no such|denied|not found",
+    re.IGNORECASE
+)
+WARNING_PATTERN = re.compile(
+    r"warning|deprecated|past duration|non[- ]monoton|dropping|discard|too large|corrupt|missing|underflow|overflow",
+    re.IGNORECASE
+)
+
+def classify(line):
+    """Level baris stderr ffmpeg (ffmpeg tidak menulis level, jadi ditebak dari isinya)."""
+    if ERROR_PATTERN.search(line):
+        return "error"
+    if WARNING_PATTERN.search(line):
+        return "warning"
+    return "info"
+
+def level_index(level):
+    return LEVELS.index(level) if level in LEVELS else 0
+
+class LogBuffer:
+    """Ring buffer baris log ffmpeg satu sesi. Memori & I/O tetap konstan seberapapun ramai encoder."""
+
+    def __init__(self, maxlen=LOG_LINES, echo_level=ECHO_LEVEL):
+        self.lines = deque(maxlen=maxlen)
+        self.echo_level = level_index(echo_level)
+        self.counts = {level: 0 for level in LEVELS}
+        self._last = None
+        self._repeats = 0
+
+    def add(self, source, line):
+        """Simpan satu baris. Return True jika baris perlu dicetak ke stdout
+        (level >= echo_level dan bukan pengulangan baris sebelumnya dari sumber yang sama)."""
+        line = line[:MAX_LINE_LENGTH]
+        level = classify(line)
+        self.counts[level] += 1
+        if self._last == (source, line) and self.lines:
+            # Baris yang sama berulang (mis. saat reconnect): cukup hitung jumlahnya
+            self._repeats += 1
+            created, level, source, line, _ = self.lines[-1]
+            self.lines[-1] = (created, level, source, line, self._repeats + 1)
+            return False
+        self._last = (source, line)
+        self._repeats = 0
+        self.lines.append((time.time(), level, source, line, 1))
+        return level_index(level) >= self.echo_level
+
+    def tail(self, count=30, min_level="info"):
+        """`count` baris terakhir dengan level >= min_level, urut dari yang terlama."""
+        minimum = level_index(min_level)
+        result = []
+        for entry in reversed(self.lines):
+            if level_index(entry[1]) >= minimum:
+                result.append(entry)
+                if len(result) >= count:
+                    break
+        return result[::-1]
+
+    def format(self, count=30, min_level="info", max_chars=3800):
+        """Teks log untuk Telegram (baris terbaru dipertahankan jika terlalu panjang)."""
+        lines = []
+        total = 0
+        for created, level, source, line, repeats in reversed(self.tail(count, min_level)):
+            text = (f"{time.strftime('%H:%M:%S', time.localtime(created))} "
+                    f"{'🚫' if level == 'error' else '⚠️' if level == 'warning' else '·'} [{source}] {line}"
+                    f"{f' (x{repeats})' if repeats > 1 else ''}")
+            total += len(text) + 1
+            if total > max_chars:
+                break
+            lines.append(text)
+        return "\n".join(reversed(lines))
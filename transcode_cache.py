@@ -0,0 +1,256 @@
+import os, json, time, hashlib, tempfile, threading, sys
+import concurrent.futures
+import cpu_alloc
+
+CACHE_DIR = 'cache'
+CACHE_INDEX = os.path.join(CACHE_DIR, 'index.json')
+DEFAULT_CACHE_MAX_GB = 20
+# last_used entry cukup diperbarui sekali per sekian detik (urutan LRU tidak perlu lebih presisi)
+LAST_USED_RESOLUTION = 60
+
+# Lock index cache hanya dipegang selama baca/tulis index.json, tidak pernah selama hashing/transcode
+_lock = threading.Lock()
+# File cache yang sedang dipakai live (jumlah sesi pemakai), tidak boleh dihapus saat eviction.
+# Lock sendiri agar pin/unpin dari event loop tidak menunggu pekerjaan cache yang lain.
+_pinned = {}
+_pin_lock = threading.Lock()
+# Transcode yang sedang berjalan per key cache: pemanggil lain untuk key sama menunggu hasil yang sama
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def load_index():
+    if not os.path.exists(CACHE_INDEX):
+        return {"entries": {}, "hashes": {}}
+    with open(CACHE_INDEX, 'r') as f:
+        index = json.load(f)
+    index.setdefault("entries", {})
+    index.setdefault("hashes", {})
+    return index
+
+def save_index(index):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_path = CACHE_INDEX + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, CACHE_INDEX)
+
+def hash_file(path, chunk_size=1024 * 1024):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def known_hash(path, stat, index):
+    """Hash yang tersimpan di index untuk file ini, atau None jika belum ada / file sudah berubah."""
+    known = index["hashes"].get(os.path.abspath(path))
+    if known and known["size"] == stat.st_size and known["mtime"] == stat.st_mtime:
+        return known["sha256"]
+    return None
+
+def remember_hash(path, digest):
+    """Simpan hash yang sudah dihitung di luar (mis. saat upload) agar file tidak di-hash ulang."""
+    stat = os.stat(path)
+    with _lock:
+        index = load_index()
+        index["hashes"][os.path.abspath(path)] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+        save_index(index)
+
+def file_hash(path):
+    """Hash isi file, disimpan per (path, size, mtime) agar file besar tidak di-hash ulang
+    (dipakai juga oleh library video). SHA-256 dihitung di luar lock."""
+    stat = os.stat(path)
+    with _lock:
+        digest = known_hash(path, stat, load_index())
+    if digest:
+        return digest
+    digest = hash_file(path)
+    with _lock:
+        # Index dibaca ulang: mungkin sudah diubah thread lain selama hashing
+        index = load_index()
+        index["hashes"][os.path.abspath(path)] = {"size": stat.st_size, "mtime": stat.st_mtime, "sha256": digest}
+        save_index(index)
+    return digest
+
+# Container hasil cache: mp4 untuk loop satu file, mpegts untuk playlist (disambung byte-per-byte)
+CONTAINERS = {"mp4": ".mp4", "mpegts": ".ts"}
+
+def cache_key(digest, quality, mode, container="mp4"):
+    key = f"{digest[:32]}_{quality}_{mode}"
+    return key if container == "mp4" else f"{key}_{container}"
+
+def lookup(video_path, quality, mode, container="mp4"):
+    """Cari hasil transcode di cache. Return path file cache atau None.
+
+    index.json hanya ditulis jika ada perubahan (entry hilang dibuang / last_used diperbarui).
+    """
+    key = cache_key(file_hash(video_path), quality, mode, container)
+    with _lock:
+        index = load_index()
+        entry = index["entries"].get(key)
+        changed = False
+        if entry and not os.path.exists(entry["path"]):
+            del index["entries"][key]
+            entry = None
+            changed = True
+        if entry and time.time() - entry["last_used"] >= LAST_USED_RESOLUTION:
+            entry["last_used"] = time.time()
+            changed = True
+        if changed:
+            save_index(index)
+        return entry["path"] if entry else None
+
+def pin(path):
+    path = os.path.abspath(path)
+    with _pin_lock:
+        _pinned[path] = _pinned.get(path, 0) + 1
+
+def unpin(path):
+    path = os.path.abspath(path)
+    with _pin_lock:
+        if _pinned.get(path, 0) <= 1:
+            _pinned.pop(path, None)
+        else:
+            _pinned[path] -= 1
+
+def build_prepare_command(ffmpeg_path, input_file, output_file, preset, final_resolution, container="mp4", threads=None):
+    gop = str(int(float(preset["fps"])) * 2)
+    if container == "mpegts":
+        output_args = ["-f", "mpegts", output_file]
+    else:
+        output_args = ["-movflags", "+faststart", "-f", "mp4", output_file]
+    return [
+        ffmpeg_path, "-y", "-i", input_file,
+        "-s", final_resolution,
+        "-r", preset["fps"],
+        "-c:v", "libx264", "-preset", "veryfast",
+        "-b:v", preset["video_bitrate"],
+        "-maxrate", preset["maxrate"],
+        "-bufsize", preset["bufsize"],
+        # GOP tetap 2 detik agar hasilnya bisa di-copy dan di-loop tanpa encode ulang
+        "-g", gop, "-keyint_min", gop, "-sc_threshold", "0",
+        "-c:a", "aac", "-b:a", preset["audio_bitrate"],
+        # Audio disamakan agar potongan playlist bisa disambung tanpa encode ulang
+        "-ar", "44100", "-ac", "2",
+    ] + (["-threads", str(threads)] if threads else []) + output_args
+
+def prepare_video(video_path, quality, mode, ffmpeg_path, max_bytes=None, container="mp4", allocator=None):
+    """Transcode video sekali ke format yang sesuai preset lalu simpan di cache.
+
+    `allocator` (CoreAllocator) membatasi ffmpeg ke core pool selama transcode; None = tanpa pinning.
+    """
+    from livestream import YOUTUBE_PRESET, adjust_resolution_for_mode
+
+    cached = lookup(video_path, quality, mode, container)
+    if cached:
+        print(f"[INFO] Video sudah ada di cache: {cached}")
+        return cached
+
+    preset = YOUTUBE_PRESET.get(quality, YOUTUBE_PRESET["720p60"])
+    final_resolution = adjust_resolution_for_mode(preset["resolution"], mode)
+
+    key = cache_key(file_hash(video_path), quality, mode, container)
+
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = concurrent.futures.Future()
+    if not owner:
+        # Upload, prefetch playlist & prewarm jadwal bisa meminta video yang sama bersamaan
+        print(f"[INFO] Menunggu cache {quality}/{mode} untuk {video_path} yang sedang disiapkan...")
+        return future.result()
+
+    try:
+        # Bisa saja selesai disiapkan pemanggil lain di antara lookup di atas dan klaim key ini
+        output_file = lookup(video_path, quality, mode, container) or _transcode(
+            video_path, key, quality, mode, container, ffmpeg_path, preset, final_resolution, allocator
+        )
+        future.set_result(output_file)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+    evict(max_bytes if max_bytes is not None else DEFAULT_CACHE_MAX_GB * 1024 ** 3)
+    print(f"[INFO] Cache siap: {output_file}")
+    return output_file
+
+def _transcode(video_path, key, quality, mode, container, ffmpeg_path, preset, final_resolution, allocator):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ext = CONTAINERS[container]
+    output_file = os.path.join(CACHE_DIR, f"{key}{ext}")
+    # Nama sementara unik: tidak pernah bertabrakan dengan proses lain yang menulis ke cache
+    fd, tmp_file = tempfile.mkstemp(prefix=f"{key}.", suffix=f".part{ext}", dir=CACHE_DIR)
+    os.close(fd)
+
+    print(f"[INFO] Menyiapkan cache {quality}/{mode} untuk {video_path}...")
+    try:
+        # Pekerjaan latar: tidak boleh merebut core cadangan bot atau mengganggu encoder live
+        result = cpu_alloc.run_background(
+            lambda threads: build_prepare_command(
+                ffmpeg_path, video_path, tmp_file, preset, final_resolution, container, threads
+            ),
+            f"cache {key[:8]}", allocator
+        )
+        if result.returncode != 0:
+            error = result.stderr.decode(errors="ignore").strip().splitlines()[-1:] or ["unknown error"]
+            raise RuntimeError(f"[ERROR] Gagal transcode {video_path}: {error[0]}")
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+    with _lock:
+        index = load_index()
+        index["entries"][key] = {
+            "path": output_file,
+            "source": os.path.abspath(video_path),
+            "quality": quality,
+            "mode": mode,
+            "container": container,
+            "size": os.path.getsize(output_file),
+            "created": time.time(),
+            "last_used": time.time(),
+        }
+        save_index(index)
+    return output_file
+
+def cache_size(index=None):
+    index = index or load_index()
+    return sum(entry["size"] for entry in index["entries"].values())
+
+def evict(max_bytes):
+    """Hapus entry yang paling lama tidak dipakai (LRU) sampai ukuran cache <= max_bytes."""
+    with _lock:
+        index = load_index()
+        total = cache_size(index)
+        for key, entry in sorted(index["entries"].items(), key=lambda item: item[1]["last_used"]):
+            if total <= max_bytes:
+                break
+            with _pin_lock:
+                pinned = os.path.abspath(entry["path"]) in _pinned
+            if pinned:
+                continue
+            if os.path.exists(entry["path"]):
+                os.remove(entry["path"])
+            total -= entry["size"]
+            del index["entries"][key]
+            print(f"[INFO] Cache dihapus (LRU): {entry['path']}")
+        save_index(index)
+        return total
+
+if __name__ == "__main__":
+    # Pemakaian: python transcode_cache.py <video> [resolusi] [mode]
+    from livestream import find_ffmpeg
+    if len(sys.argv) < 2:
+        print("Pemakaian: python transcode_cache.py <video> [resolusi] [mode]")
+        sys.exit(1)
+    prepare_video(
+        sys.argv[1],
+        sys.argv[2] if len(sys.argv) > 2 else "720p60",
+        sys.argv[3] if len(sys.argv) > 3 else "landscape",
+        find_ffmpeg()
+    )